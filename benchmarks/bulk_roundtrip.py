@@ -0,0 +1,53 @@
+"""
+Round-trip check for evmush.accounts.bulk: what an export writes, an import must read back unchanged,
+with the encoded password under password_hash so it is never hashed a second time.
+
+Needs nothing beyond the standard library. Run from the repository root:
+
+    python -m benchmarks.bulk_roundtrip
+"""
+import io
+
+from evmush.accounts.bulk import EXPORT_FIELDS, read_records, write_records
+
+ROWS = [
+    {'id': 1, 'username': 'Alice', 'email': 'alice@example.com',
+     'password_hash': 'pbkdf2_sha256$260000$salt$c2VjcmV0aGFzaA==', 'is_superuser': True,
+     'date_joined': '2020-01-01 00:00:00+00:00', 'last_login': None},
+    {'id': 2, 'username': 'Bob, Jr.', 'email': 'bob@example.com',
+     'password_hash': 'argon2$argon2id$v=19$m=102400,t=2,p=8$c2FsdA$aGFzaA', 'is_superuser': False,
+     'date_joined': '2021-06-15 12:30:00+00:00', 'last_login': '2021-06-16 08:00:00+00:00'},
+]
+
+
+def roundtrip(fmt):
+    stream = io.StringIO()
+    assert write_records(stream, ROWS, fmt) == len(ROWS)
+    stream.seek(0)
+    records = list(read_records(stream, fmt))
+    assert len(records) == len(ROWS), records
+    for row, record in zip(ROWS, records):
+        assert 'password' not in record, f"{fmt}: export wrote a plaintext password column"
+        assert record['password_hash'] == row['password_hash'], (fmt, record)
+        assert record['username'] == row['username'] and record['email'] == row['email'], (fmt, record)
+    assert set(records[0].keys()) == set(EXPORT_FIELDS), (fmt, records[0].keys())
+
+
+def rejects_non_objects():
+    try:
+        list(read_records(io.StringIO('["not", "a", "record"]\n'), 'jsonl'))
+    except ValueError:
+        return
+    raise AssertionError("jsonl lines that aren't objects must be rejected")
+
+
+def main():
+    for fmt in ('csv', 'jsonl'):
+        roundtrip(fmt)
+        print(f"{fmt}: ok")
+    rejects_non_objects()
+    print("non-object jsonl lines: rejected")
+
+
+if __name__ == "__main__":
+    main()
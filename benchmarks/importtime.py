@@ -0,0 +1,72 @@
+"""
+Import-time profile of evmush modules, from the output of `python -X importtime`.
+
+Each module is imported in a fresh interpreter, so nothing is already cached in sys.modules. Some modules
+need Evennia importable and Django settings configured. Run from the game directory:
+
+    python -m benchmarks.importtime [module ...] [--top N]
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    "evmush",
+    "evmush.utils.text",
+    "evmush.utils.styling",
+    "evmush.utils.controllers",
+    "evmush.accounts.controller",
+    "evmush.bbs.controller",
+]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(output):
+    """
+    Args:
+        output (str): stderr of a `python -X importtime` run.
+
+    Returns:
+        entries (list): (module, self microseconds, cumulative microseconds, nesting depth), in import order.
+    """
+    entries = list()
+    for line in output.splitlines():
+        if (match := _LINE.match(line)):
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def profile(module):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    return result.returncode, parse_importtime(result.stderr), result.stderr
+
+
+def report(module, top=15):
+    code, entries, stderr = profile(module)
+    if code:
+        print(f"{module}: import failed.\n{stderr.splitlines()[-1] if stderr else ''}\n")
+        return
+    # Interpreter startup (site, encodings, ...) is in the output too. Only count the requested module.
+    total = next((entry[2] for entry in reversed(entries) if entry[0] == module), 0)
+    print(f"{module}: {total / 1000:.1f}ms cumulative, {len(entries)} modules imported in all.")
+    print(f"  {'Module':<50} {'Self ms':>9} {'Cumul ms':>9}")
+    for name, self_us, cumulative_us, depth in sorted(entries, key=lambda entry: entry[1], reverse=True)[:top]:
+        print(f"  {name:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest modules to list.")
+    args = parser.parse_args()
+    for module in args.modules:
+        report(module, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark for evmush.utils.text.sanitize_string and penn_substitutions, against the old
+multi-pass str.replace versions they replaced. Also checks that sanitize_string leaves no sequence it
+should have removed, even when removing one sequence forms another.
+
+Needs Evennia importable. Run from the game directory:
+
+    python -m benchmarks.sanitize
+"""
+import timeit
+
+from evennia.utils.ansi import ANSI_PARSER, ANSIString
+
+from evmush.utils.text import sanitize_string, penn_substitutions
+
+SAMPLES = [
+    "Plain Old Name",
+    "  A |rcolored|n subject%rwith a%tfew |/ escapes|- in it  ",
+    "A long title " * 20,
+]
+
+# Input -> what sanitize_string must return for it.
+SANITIZE_CASES = {
+    "|\n/": "",
+    "%\nr": "",
+    "|\t-": "",
+    "||//": "",
+    "Title|\n/With%\tRBreaks": "TitleWithBreaks",
+    "100%\t%rdone": "100%done",
+}
+
+
+def old_sanitize_string(text=None, length=None, strip_ansi=False, strip_mxp=True, strip_newlines=True,
+                        strip_indents=True):
+    if not text:
+        return ''
+    text = text.strip()
+    if strip_mxp:
+        text = ANSI_PARSER.strip_mxp(text)
+    if strip_ansi:
+        text = ANSIString(text).clean()
+    if strip_newlines:
+        for bad_char in ['\n', '%r', '%R', '|/']:
+            text = text.replace(bad_char, '')
+    if strip_indents:
+        for bad_char in ['\t', '%t', '%T', '|-']:
+            text = text.replace(bad_char, '')
+    if length:
+        text = text[:length]
+    return text
+
+
+def old_penn_substitutions(input=None):
+    if not input:
+        return ''
+    for bad_char in ['%r', '%R']:
+        input = input.replace(bad_char, '|/')
+    for bad_char in ['%t', '%T']:
+        input = input.replace(bad_char, '|-')
+    return input
+
+
+def bench(label, func, number=20000, **kwargs):
+    elapsed = timeit.timeit(lambda: [func(sample, **kwargs) for sample in SAMPLES], number=number)
+    print(f"{label:<40}{elapsed * 1000000 / (number * len(SAMPLES)):>10.2f} usec/call")
+
+
+def check():
+    for text, expected in SANITIZE_CASES.items():
+        assert (result := sanitize_string(text)) == expected, f"sanitize_string({text!r}) gave {result!r}"
+    for sample in SAMPLES:
+        for strip_ansi in (False, True):
+            assert sanitize_string(sample, strip_ansi=strip_ansi) == old_sanitize_string(sample, strip_ansi=strip_ansi)
+    print(f"sanitize_string: {len(SANITIZE_CASES)} cases ok")
+
+
+def main():
+    check()
+    for strip_ansi in (False, True):
+        bench(f"old sanitize_string(strip_ansi={strip_ansi})", old_sanitize_string, strip_ansi=strip_ansi)
+        bench(f"new sanitize_string(strip_ansi={strip_ansi})", sanitize_string, strip_ansi=strip_ansi)
+    bench("old penn_substitutions", old_penn_substitutions)
+    bench("new penn_substitutions", penn_substitutions)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
 Core of the EvMUSH API. It is also styled as a plugin.
 
 """
-from evennia.utils.utils import lazy_property
 # This dictionary will be filled in with useful singletons as the system loads.
 
 # The Core must always load first.
@@ -15,29 +14,14 @@ class EvMushApi:
 
     def __init__(self):
         self.storage = dict()
-        pspace_dict = dict()
-
-        def get_or_create_pspace(pspace):
-            if pspace in pspace_dict:
-                return pspace_dict[pspace]
-            model, created = Pluginspace.objects.get_or_create(db_name=pspace)
-            if created:
-                model.save()
-            pspace_dict[pspace] = model
-            return model
 
         from django.conf import settings
         from evennia.utils.utils import class_from_module
 
         from evmush.models import Pluginspace, Namespace
 
-        for plugin in settings.EVMUSH_PLUGINS.keys():
-            get_or_create_pspace(plugin)
-
-        for namespaces in settings.IDENTITY_NAMESPACES:
-            nspace, created = Namespace.objects.get_or_create(db_name=namespaces)
-            if created:
-                nspace.save()
+        self.register_names(Pluginspace, settings.EVMUSH_PLUGINS.keys())
+        self.register_names(Namespace, settings.IDENTITY_NAMESPACES)
 
         styler_class = class_from_module(settings.STYLER_CLASS)
         self.storage['styler'] = styler_class
@@ -53,10 +37,32 @@ class EvMushApi:
             logger.log_trace(e)
             print(e)
 
+    @staticmethod
+    def register_names(model, names):
+        """
+        Makes sure a row exists for every name, with one query when they all already do and a single bulk
+        insert for any that don't.
+
+        Args:
+            model (Pluginspace or Namespace): Any model with a unique db_name.
+            names (iterable of str): The names to register.
+        """
+        names = set(names)
+        if not names:
+            return
+        existing = set(model.objects.filter(db_name__in=names).values_list('db_name', flat=True))
+        if (missing := names - existing):
+            model.objects.bulk_create([model(db_name=name) for name in sorted(missing)], ignore_conflicts=True)
+
+
+_API = None
+
 
-@lazy_property
 def api():
-    return EvMushApi()
+    global _API
+    if _API is None:
+        _API = EvMushApi()
+    return _API
 
 
 def init_settings(settings):
@@ -83,6 +89,9 @@ def init_settings(settings):
     settings.AT_SERVER_STARTSTOP_MODULE = "evmush.at_server_startstop"
     settings.HELP_MORE = False
     settings.CONNECTION_SCREEN_MODULE = "evmush.connection_screens"
+    # The connection screen is pre-rendered once for each of these client widths.
+    # Clients are served the widest one that fits them.
+    settings.CONNECTION_SCREEN_WIDTHS = (78, 80, 100, 120)
     settings.CMD_IGNORE_PREFIXES = ""
 
     # The Styler is an object that generates commonly-used formatting, like
@@ -127,6 +136,20 @@ def init_settings(settings):
     settings.CONTROLLER_MANAGER_CLASS = "evmush.utils.controllers.ControllerManager"
     settings.BASE_CONTROLLER_CLASS = "evmush.utils.controllers.EvMUSHController"
     settings.CONTROLLERS = dict()
+    # Controller alerts to admins: (alerts allowed per window, window in seconds). Beyond that, alerts are
+    # held and sent as one digest when the window ends.
+    settings.CONTROLLER_ALERT_RATE = (5, 5.0)
+    # Controllers may declare 'dependencies' (a list of controller keys) and 'lazy' (bool) in their CONTROLLERS
+    # entry. Cache warm-ups of controllers that don't depend on each other run on up to this many threads.
+    settings.CONTROLLER_LOAD_THREADS = 4
+    # If True, every public controller method records call counts, latency, query counts and errors.
+    # View them with @controllers/stats.
+    settings.CONTROLLER_INSTRUMENTATION = False
+    # If True, commands log likely N+1 query patterns and slow queries. For debugging; it adds overhead.
+    settings.QUERY_WATCH = False
+    # The same statement run more than this many times in one command is reported.
+    settings.QUERY_WATCH_REPEAT_THRESHOLD = 10
+    settings.QUERY_WATCH_SLOW_MS = 100.0
 
 
     ######################################################################
@@ -172,6 +195,17 @@ def init_settings(settings):
     settings.RESTRICTED_ACCOUNT_EMAIL = False
     settings.RESTRICTED_ACCOUNT_PASSWORD = False
 
+    # Password hashing/verification runs on a thread pool of at most this many threads.
+    settings.PASSWORD_HASH_THREADS = 4
+
+    # Per-host token buckets for the login screen, as (tokens per second, burst size, max hosts tracked).
+    # They are checked before any password hashing or database work.
+    settings.LOGIN_THROTTLE = (0.2, 5, 10000)
+    settings.CREATE_ACCOUNT_THROTTLE = (1 / 300, 2, 10000)
+
+    # How many Accounts @account/list shows per page.
+    settings.ACCOUNT_LIST_PAGE_SIZE = 50
+
     settings.EXAMINE_HOOKS['account'] = ['account', 'access', 'commands', 'tags', 'attributes', 'puppets']
 
     ######################################################################
@@ -220,6 +254,15 @@ def init_settings(settings):
     # call a person.
     settings.NAME_DUB_SYSTEM = False
 
+    ######################################################################
+    # BBS Options
+    ######################################################################
+    # Where BBS read state is kept. 'posts' is one BBSPostRead row per account and post. 'bitmap' is one compact
+    # BBSReadState row per account and board. Run evmush.bbs.readstate.migrate_post_reads() before switching.
+    # The 'posts' store's BBSUnreadCount counters aren't kept current while 'bitmap' is in use, so before
+    # switching back, delete them all (BBSUnreadCount.objects.all().delete()) and they'll be recounted on demand.
+    settings.BBS_READ_STORE = 'posts'
+
     ######################################################################
     # Permissions
     ######################################################################
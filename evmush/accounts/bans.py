@@ -0,0 +1,141 @@
+"""
+Keeps every active Account ban in memory, so logins and listings never need to load ban Attributes.
+"""
+import heapq
+from collections import defaultdict
+
+from twisted.internet import reactor
+
+from evennia.accounts.models import AccountDB
+from evennia.utils.logger import log_trace
+
+from athanor.utils.time import utcnow
+
+
+class BanRegistry:
+    """
+    All active bans, kept in a dict for lookups plus a min-heap keyed on expiry. A single reactor timer is
+    always set for the earliest expiry, and clears expired bans as it fires rather than waiting for the banned
+    Account to try logging in.
+
+    The ban data itself is still stored by each Account's BanHandler, as the 'ban' Attribute in category
+    'system'.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.bans = dict()
+        self.heap = list()
+        self.timer = None
+
+    def load(self):
+        """
+        Loads every stored ban in a single query, after converting any bans still in the old format.
+        """
+        self.bans = dict()
+        self.heap = list()
+        now = utcnow()
+        self.convert_legacy(now)
+        for row in AccountDB.db_attributes.through.objects.filter(attribute__db_key='ban',
+                                                                  attribute__db_category='system').select_related(
+                'attribute'):
+            if not (state := row.attribute.value) or not (until := state.get('until', None)):
+                continue
+            if until <= now:
+                self._expire(row.accountdb_id)
+                continue
+            self.bans[row.accountdb_id] = dict(state)
+            self.heap.append((until, row.accountdb_id))
+        heapq.heapify(self.heap)
+        self.schedule()
+
+    def convert_legacy(self, now):
+        """
+        Bans made before the BanRegistry were stored as the _banned (expiry) and _ban_reason Attributes.
+        Still-active ones become 'ban' Attributes, so those Accounts stay banned. The old Attributes are then
+        deleted either way.
+        """
+        legacy = defaultdict(dict)
+        for row in AccountDB.db_attributes.through.objects.filter(attribute__db_key__in=('_banned', '_ban_reason'),
+                                                                  attribute__db_category__isnull=True)\
+                .select_related('attribute'):
+            legacy[row.accountdb_id][row.attribute.db_key] = row.attribute.value
+        for acc_id, old in legacy.items():
+            try:
+                if not (account := self.backend.id_map.get(acc_id, None)):
+                    account = AccountDB.objects.get(id=acc_id)
+                if (until := old.get('_banned', None)) and until > now and not account.ban.state:
+                    account.ban.set(None, until, old.get('_ban_reason', None) or 'none given')
+                account.attributes.remove(key='_banned')
+                account.attributes.remove(key='_ban_reason')
+            except Exception:
+                log_trace()
+
+    def ban(self, account, until, reason, enactor=None):
+        account.ban.set(enactor, until, reason)
+        self.bans[account.id] = dict(account.ban.state)
+        heapq.heappush(self.heap, (until, account.id))
+        self.schedule()
+
+    def unban(self, account):
+        account.ban.clear()
+        # The heap entry is left behind and skipped when it comes up.
+        self.bans.pop(account.id, None)
+        self.schedule()
+
+    def forget(self, acc_id):
+        """
+        Drops a deleted Account's ban without touching its (already deleted) Attributes.
+        """
+        if self.bans.pop(acc_id, None):
+            self.schedule()
+
+    def get_state(self, account):
+        """
+        Returns:
+            False if not banned. A dict of 'left', 'reason' and 'until' if so.
+        """
+        if not (state := self.bans.get(account.id, None)):
+            return False
+        if (until := state['until']) <= (now := utcnow()):
+            self.expire()
+            return False
+        return {
+            'left': until - now,
+            'reason': state.get('reason', 'none given'),
+            'until': until
+        }
+
+    def is_banned(self, account):
+        return bool(self.get_state(account))
+
+    def schedule(self):
+        """
+        (Re)sets the single timer for whichever live ban expires first.
+        """
+        if self.timer and self.timer.active():
+            self.timer.cancel()
+        self.timer = None
+        while self.heap and self.bans.get(self.heap[0][1], dict()).get('until', None) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if self.heap:
+            delay = max((self.heap[0][0] - utcnow()).total_seconds(), 0)
+            self.timer = reactor.callLater(delay, self.expire)
+
+    def expire(self):
+        now = utcnow()
+        while self.heap and self.heap[0][0] <= now:
+            until, acc_id = heapq.heappop(self.heap)
+            if (state := self.bans.get(acc_id, None)) and state['until'] == until:
+                del self.bans[acc_id]
+                self._expire(acc_id)
+        self.schedule()
+
+    def _expire(self, acc_id):
+        try:
+            if (account := self.backend.id_map.get(acc_id, None)):
+                account.ban.clear()
+            else:
+                AccountDB.objects.get(id=acc_id).attributes.remove(key='ban', category='system')
+        except Exception:
+            log_trace()
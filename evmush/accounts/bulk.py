@@ -0,0 +1,61 @@
+"""
+Reading and writing Account records for bulk import/export. Supports CSV (with a header row) and JSONL.
+
+Each record has a username and email, plus either a plain password or an already-encoded password_hash
+(as written by an export). Exports never write a password column, so re-importing one keeps every login.
+"""
+import csv
+import json
+
+EXPORT_FIELDS = ('id', 'username', 'email', 'password_hash', 'is_superuser', 'date_joined', 'last_login')
+FORMATS = ('csv', 'jsonl')
+
+
+def guess_format(path):
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.json')) else 'csv'
+
+
+def read_records(stream, fmt='csv'):
+    """
+    Yields one dict per record in stream.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format must be one of: {', '.join(FORMATS)}")
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key.strip().lower(): (val or '').strip() for key, val in row.items() if key}
+        return
+    for num, line in enumerate(stream, start=1):
+        if not (line := line.strip()):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {num} is not valid JSON.")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {num} is not a JSON object.")
+        yield record
+
+
+def write_records(stream, rows, fmt='csv'):
+    """
+    Writes rows (dicts with EXPORT_FIELDS keys) to stream as they arrive.
+
+    Returns:
+        count (int): How many rows were written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format must be one of: {', '.join(FORMATS)}")
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps({key: row.get(key) for key in EXPORT_FIELDS}, default=str))
+        stream.write('\n')
+        count += 1
+    return count
@@ -1,14 +1,20 @@
-from evennia.contrib.unixcommand import UnixCommand
-
 import athanor
 from athanor.utils.command import AthanorCommand
+from evmush.utils.querywatch import QueryWatchMixin
 
 
-class AdministrationCommand(AthanorCommand):
+class AdministrationCommand(QueryWatchMixin, AthanorCommand):
     help_category = "Account Management"
     controller_key = 'account'
     account_caller = True
 
+    def report_failure(self, failure):
+        """
+        Errback for controller operations that finish later. Shows ValueErrors to the caller.
+        """
+        failure.trap(ValueError)
+        self.msg(str(failure.value))
+
 
 class CmdAccount(AdministrationCommand):
     """
@@ -20,8 +26,8 @@ class CmdAccount(AdministrationCommand):
             Display a breakdown of information all about an Account.
             Your own, if not targeted.
 
-        @account/list
-            Show all accounts in the system.
+        @account/list [<page>]
+            Show all accounts in the system, a page at a time.
 
         @account/create <username>,<email>,<password>
             Create a new account.
@@ -49,10 +55,23 @@ class CmdAccount(AdministrationCommand):
 
         @account/boot <account>=<reason>
             Forcibly disconnect an Account.
+
+        @account/throttle
+            Show login and account creation throttle counters.
+
+        @account/import <file>
+            Bulk-create Accounts from a .csv (with a header row) or .jsonl
+            file on the server. Records need username, email and either
+            password or password_hash. Superuser only.
+
+        @account/export <file>
+            Write every Account, with password hashes, to a .csv or .jsonl
+            file on the server. Superuser only.
     """
     key = '@account'
     locks = "cmd:pperm(Helper)"
-    switch_options = ('list', 'create', 'disable', 'enable', 'rename', 'ban', 'unban', 'password', 'email', 'boot')
+    switch_options = ('list', 'create', 'disable', 'enable', 'rename', 'ban', 'unban', 'password', 'email', 'boot',
+                      'throttle', 'import', 'export')
     args_delim = ','
     switch_syntax = {
         'create': "<username>,<email>,<password>",
@@ -74,13 +93,15 @@ class CmdAccount(AdministrationCommand):
         self.msg(self.controller.examine_account(self.session, self.args))
 
     def switch_list(self):
-        self.msg(self.controller.list_accounts(self.session))
+        self.msg(self.controller.list_accounts(self.session, self.args))
 
     def switch_create(self):
         if not len(self.argslist) == 3:
             self.syntax_error()
         username, email, password = self.argslist
-        self.controller.create_account(self.session, username, email, password)
+        # The password is hashed off the reactor thread, so failures arrive later through the Deferred.
+        deferred = self.controller.create_account(self.session, username, email, password)
+        deferred.addErrback(self.report_failure)
 
     def switch_disable(self):
         self.controller.disable_account(self.session, self.lhs, self.rhs)
@@ -89,7 +110,9 @@ class CmdAccount(AdministrationCommand):
         self.controller.enable_account(self.session, self.lhs)
 
     def switch_password(self):
-        self.controller.password_account(self.session, self.lhs, self.rhs)
+        # The password is hashed off the reactor thread, so failures arrive later through the Deferred.
+        deferred = self.controller.password_account(self.session, self.lhs, self.rhs)
+        deferred.addErrback(self.report_failure)
 
     def switch_email(self):
         self.controller.email_account(self.session, self.lhs, self.rhs)
@@ -97,6 +120,16 @@ class CmdAccount(AdministrationCommand):
     def switch_boot(self):
         self.controller.disconnect_account(self.session, self.lhs, self.rhs)
 
+    def switch_throttle(self):
+        self.msg(self.controller.throttle_stats(self.session))
+
+    def switch_import(self):
+        deferred = self.controller.import_accounts(self.session, self.args)
+        deferred.addCallbacks(self.msg, self.report_failure)
+
+    def switch_export(self):
+        self.msg(self.controller.export_accounts(self.session, self.args))
+
 
 class CmdAccess(AdministrationCommand):
     """
@@ -117,6 +150,10 @@ class CmdAccess(AdministrationCommand):
             Display all managed Permissions and which Accounts hold them.
             Could be very spammy.
 
+        @access/check
+            Compare the in-memory Permissions index to the database and
+            repair any drift.
+
         @access/super <account>=SUPER DUPER
             Promote an Account to Superuser status. Use again to demote.
             Silly verification string required for accident prevention.
@@ -137,13 +174,14 @@ class CmdAccess(AdministrationCommand):
             'rhs_req': True
         },
         'all': dict(),
+        'check': dict(),
         'revoke': {
             'syntax': '<account>=<permission>',
             'lhs_req': True,
             'rhs_req': True
         }
     }
-    switch_options = ['directory', 'super', 'grant', 'all', 'revoke']
+    switch_options = ['directory', 'super', 'grant', 'all', 'revoke', 'check']
 
     def switch_main(self):
         account = self.args if self.args else self.account
@@ -165,3 +203,61 @@ class CmdAccess(AdministrationCommand):
 
     def switch_directory(self):
         self.msg(self.controller.permissions_directory(self.session))
+
+    def switch_check(self):
+        self.msg(self.controller.check_permissions(self.session))
+
+
+class CmdControllers(AdministrationCommand):
+    """
+    Shows how the game's controllers are performing.
+
+    Usage:
+        @controllers
+            Show how long each controller took to load.
+
+        @controllers/stats [<controller>]
+            Show per-method call counts, latency, database queries and
+            errors. Requires CONTROLLER_INSTRUMENTATION = True.
+
+        @controllers/reset
+            Clear the collected method statistics.
+    """
+    key = '@controllers'
+    locks = "cmd:pperm(Developer)"
+    help_category = "System"
+    switch_options = ('stats', 'reset')
+
+    def switch_main(self):
+        manager = self.controller.manager
+        message = [self.styled_header("Controller Load Times")]
+        for key, secs in manager.load_times.items():
+            message.append(f"{key:<20} {secs * 1000:>10.1f}ms")
+        message.append(self.styled_footer())
+        self.msg('\n'.join(str(l) for l in message))
+
+    def switch_stats(self):
+        stats = self.controller.manager.dump_stats()
+        stats.pop('load_times', None)
+        if self.args:
+            if self.args not in stats:
+                raise ValueError(f"No statistics for controller '{self.args}'.")
+            stats = {self.args: stats[self.args]}
+        if not any(stats.values()):
+            raise ValueError("No statistics collected. Is CONTROLLER_INSTRUMENTATION enabled?")
+        styling = self.account.styler
+        table = styling.compiled_table(('Method', None), ('Calls', 7, 'r'), ('Avg ms', 8, 'r'), ('Max ms', 8, 'r'),
+                                       ('Avg Q', 6, 'r'), ('Err%', 6, 'r'))
+        message = list()
+        for key, methods in stats.items():
+            message.append(styling.styled_header(f"Controller: {key}"))
+            rows = sorted(methods.items(), key=lambda item: item[1]['avg_ms'] * item[1]['calls'], reverse=True)
+            message.extend(table.render((name, data['calls'], f"{data['avg_ms']:.1f}", f"{data['max_ms']:.1f}",
+                                         f"{data['avg_queries']:.1f}", f"{data['error_rate'] * 100:.0f}")
+                                        for name, data in rows))
+        message.append(styling.blank_footer)
+        self.msg('\n'.join(str(l) for l in message))
+
+    def switch_reset(self):
+        self.controller.manager.reset_stats()
+        self.msg("Controller statistics cleared.")
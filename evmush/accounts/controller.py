@@ -1,16 +1,34 @@
-import re
+import textwrap
 from collections import defaultdict
+from itertools import islice
 
 from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 
+from twisted.internet.defer import succeed, fail, gatherResults
+from twisted.internet.task import coiterate
+
+from evennia.utils import create, logger
 from evennia.utils.utils import make_iter, time_format
 from evennia.utils.search import search_account
+from evennia.accounts.models import AccountDB
+from evennia.typeclasses.tags import Tag
 
 from athanor.utils.controllers import AthanorController, AthanorControllerBackend
 from athanor.accounts.typeclasses import AthanorAccount
 from athanor.accounts import messages as amsg
-from athanor.utils.text import partial_match, iter_to_string
+from athanor.accounts.bans import BanRegistry
+from athanor.accounts.bulk import EXPORT_FIELDS, read_records, write_records, guess_format
+from athanor.utils.text import PrefixIndex, NameMatcher, iter_to_string
 from athanor.utils.time import utcnow, duration_from_string
+from athanor.utils.passwords import hash_password, verify_password, store_password, EncodedPassword
+from athanor.utils.throttle import TokenBucketThrottle, session_host
+from athanor.utils.online import ONLINE
 
 
 class AthanorAccountController(AthanorController):
@@ -18,11 +36,22 @@ class AthanorAccountController(AthanorController):
 
     def __init__(self, key, manager, backend):
         super().__init__(key, manager, backend)
-        self.load()
+        self.permission_index = PrefixIndex(settings.PERMISSIONS.keys())
+        self.login_throttle = TokenBucketThrottle('login', *settings.LOGIN_THROTTLE)
+        self.create_throttle = TokenBucketThrottle('create', *settings.CREATE_ACCOUNT_THROTTLE)
 
     def create_account(self, session, username, email, password, typeclass=None, login_screen=False):
+        """
+        Validation happens immediately and raises ValueError. The password is then hashed on the password
+        pool, so the Account itself arrives later.
+
+        Returns:
+            Deferred: Fires with the new Account. Errbacks with ValueError.
+        """
         enactor = None
-        if not login_screen:
+        if login_screen:
+            self.create_throttle.enforce(session_host(session))
+        else:
             if not (enactor := session.get_account()) or not enactor.check_lock("oper(account_create)"):
                 raise ValueError("Permission denied.")
         if not username:
@@ -31,13 +60,64 @@ class AthanorAccountController(AthanorController):
             raise ValueError("An Account must have an email address!")
         if not password:
             raise ValueError("An Account must have a password!")
-        new_account = self.backend.create_account(username, email, password, typeclass=typeclass)
-        entities = {'enactor': enactor if enactor else session, 'account': new_account}
-        if login_screen:
-            amsg.CreateMessage(entities).send()
-        else:
-            amsg.CreateMessageAdmin(entities, password=password).send()
-        return new_account
+
+        def created(new_account):
+            entities = {'enactor': enactor if enactor else session, 'account': new_account}
+            if login_screen:
+                amsg.CreateMessage(entities).send()
+            else:
+                amsg.CreateMessageAdmin(entities, password=password).send()
+            return new_account
+
+        ip = session.address if login_screen else ''
+        return self.backend.create_account(username, email, password, typeclass=typeclass, ip=ip)\
+            .addCallback(created)
+
+    def import_accounts(self, session, path, fmt=None):
+        """
+        Bulk-creates Accounts from a CSV or JSONL file on the server. Admins get a single summary alert
+        rather than one per Account.
+
+        Returns:
+            Deferred: Fires with a report for the enactor.
+        """
+        if not (enactor := session.get_account()) or not enactor.is_superuser:
+            raise ValueError("Permission denied.")
+        if not path:
+            raise ValueError("Must provide a file to import!")
+        fmt = fmt or guess_format(path)
+        try:
+            stream = open(path, 'r', newline='', encoding='utf-8')
+        except OSError as err:
+            raise ValueError(f"Cannot read {path}: {err}")
+
+        def report(results):
+            created, errors = results
+            self.alert(f"|w{enactor}|n bulk-imported {len(created)} Accounts from {path} "
+                       f"({len(errors)} records skipped).", enactor=enactor)
+            message = [f"Imported {len(created)} of {len(created) + len(errors)} Accounts."]
+            message.extend(errors[:20])
+            if len(errors) > 20:
+                message.append(f"...and {len(errors) - 20} more errors.")
+            return '\n'.join(message)
+
+        deferred = self.backend.import_accounts(read_records(stream, fmt))
+        deferred.addBoth(lambda result: (stream.close(), result)[1])
+        return deferred.addCallback(report)
+
+    def export_accounts(self, session, path, fmt=None):
+        if not (enactor := session.get_account()) or not enactor.is_superuser:
+            raise ValueError("Permission denied.")
+        if not path:
+            raise ValueError("Must provide a file to export to!")
+        fmt = fmt or guess_format(path)
+        try:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                count = write_records(stream, self.backend.export_rows(), fmt)
+        except OSError as err:
+            raise ValueError(f"Cannot write {path}: {err}")
+        self.alert(f"|w{enactor}|n exported {count} Accounts to {path}.", enactor=enactor)
+        return f"Exported {count} Accounts to {path}."
 
     def rename_account(self, session, account, new_name, ignore_priv=False):
         if not (enactor := session.get_account()) or (not ignore_priv and not enactor.check_lock("pperm(Admin)")):
@@ -91,8 +171,7 @@ class AthanorAccountController(AthanorController):
         ban_date = utcnow() + duration
         if not reason:
             raise ValueError("Must include a reason!")
-        account.db._banned = ban_date
-        account.db._ban_reason = reason
+        self.backend.bans.ban(account, ban_date, reason, enactor=enactor)
         entities = {'enactor': enactor, 'account': account}
         amsg.BanMessage(entities, duration=time_format(duration.total_seconds(), style=2),
                         ban_date=ban_date.strftime('%c'), reason=reason).send()
@@ -102,28 +181,96 @@ class AthanorAccountController(AthanorController):
         if not (enactor := session.get_account()) or not enactor.check_lock("pperm(Moderator)"):
             raise ValueError("Permission denied.")
         account = self.find_account(account)
-        if not ((banned := account.db._banned) and banned > utcnow()):
+        if not self.backend.bans.is_banned(account):
             raise ValueError("Account is not banned!")
-        del account.db._banned
-        del account.db._ban_reason
+        self.backend.bans.unban(account)
         entities = {'enactor': enactor, 'account': account}
         amsg.UnBanMessage(entities).send()
 
+    def throttle_stats(self, session):
+        if not (enactor := session.get_account()) or not enactor.check_lock("pperm(Admin)"):
+            raise ValueError("Permission denied.")
+        styling = enactor.styler
+        table = styling.compiled_table(('Throttle', 10), ('Rate/s', 8, 'r'), ('Burst', 6, 'r'), ('Hosts', 8, 'r'),
+                                       ('Allowed', 10, 'r'), ('Rejected', 10, 'r'), ('Evicted', 10, 'r'))
+        rows = list()
+        for throttle in (self.login_throttle, self.create_throttle):
+            stats = throttle.stats()
+            rows.append((stats['name'], stats['rate'], stats['burst'], stats['hosts'], stats['allowed'],
+                         stats['rejected'], stats['evicted']))
+        message = [styling.styled_header("Login Throttles")]
+        message.extend(table.render(rows))
+        message.append(styling.blank_footer)
+        return '\n'.join(str(l) for l in message)
+
+    def ban_state(self, account):
+        return self.backend.bans.get_state(account)
+
     def password_account(self, session, account, new_password, ignore_priv=False, old_password=None):
+        """
+        Hashing and checking passwords happens on the password thread pool.
+
+        Returns:
+            Deferred: Fires once the new password is stored. Errbacks with ValueError on failure.
+        """
         if not (enactor := session.get_account()) or (not ignore_priv and not enactor.check_lock("oper(account_password)")):
             raise ValueError("Permission denied.")
-        if ignore_priv and not account.check_password(old_password):
-            raise ValueError("Permission denied. Password was incorrect.")
         account = self.find_account(account)
         if not new_password:
             raise ValueError("Passwords may not be empty!")
-        account.set_password(new_password)
-        account.db._date_password_changed = utcnow()
-        entities = {'enactor': enactor, 'account': account}
-        if old_password:
-            amsg.PasswordMessagePrivate(entities).send()
-        else:
-            amsg.PasswordMessageAdmin(entities, password=new_password).send()
+        checked = verify_password(account, old_password) if ignore_priv else succeed(True)
+
+        def hash_new(valid):
+            if not valid:
+                raise ValueError("Permission denied. Password was incorrect.")
+            return hash_password(new_password)
+
+        def finish(encoded):
+            store_password(account, encoded)
+            account.db._date_password_changed = utcnow()
+            entities = {'enactor': enactor, 'account': account}
+            if old_password:
+                amsg.PasswordMessagePrivate(entities).send()
+            else:
+                amsg.PasswordMessageAdmin(entities, password=new_password).send()
+            return account
+
+        checked.addCallback(hash_new)
+        checked.addCallback(finish)
+        return checked
+
+    def login_account(self, session, username, password):
+        """
+        The same checks as DefaultAccount.authenticate, in the same order and with the same security log
+        lines, except that the throttle is a token bucket and the password is checked off the reactor thread.
+        The name is matched case-insensitively against usernames only, never aliases, emails or dbrefs. The
+        Account is then handed to at_session_login for the EvMUSH ban/disabled checks.
+
+        Returns:
+            Deferred: Fires with the Account. Errbacks with ValueError on a bad username or password.
+        """
+        ip = session_host(session)
+        if not self.login_throttle.check(ip):
+            return fail(ValueError("Too many login attempts. Please wait a while and try again."))
+        if self.backend.account_typeclass.is_banned(username=username, ip=ip):
+            logger.log_sec(f"Authentication Denied (Banned): {username} (IP: {ip}).")
+            return fail(ValueError("|rYou have been banned and cannot continue from here.\n"
+                                   "If you feel this ban is in error, please email an admin.|x"))
+        account = self.backend.name_map.get(username.casefold(), None)
+
+        def checked(valid):
+            if not valid or not account.is_active:
+                logger.log_sec(f"Authentication Failure: {username} (IP: {ip}).")
+                if account:
+                    account.at_failed_login(session)
+                raise ValueError("Username and/or password is incorrect.")
+            logger.log_sec(f"Authentication Success: {account} (IP: {ip}).")
+            account.at_session_login(session)
+            return account
+
+        if not account:
+            return succeed(False).addCallback(checked)
+        return verify_password(account, password).addCallback(checked)
 
     def disconnect_account(self, session, account, reason):
         if not (enactor := session.get_account()) or not enactor.check_lock("pperm(Moderator)"):
@@ -138,7 +285,7 @@ class AthanorAccountController(AthanorController):
     def find_permission(self, perm):
         if not perm:
             raise ValueError("No permission entered!")
-        if not (found := partial_match(perm, settings.PERMISSIONS.keys())):
+        if not (found := self.permission_index.match(perm)):
             raise ValueError("Permission not found!")
         return found
 
@@ -162,7 +309,6 @@ class AthanorAccountController(AthanorController):
         if perm.lower() in account.permissions.all():
             raise ValueError(f"{account} already has that Permission!")
         account.permissions.add(perm)
-        self.permissions[perm.lower()].add(account)
         entities = {'enactor': enactor, 'account': account}
         amsg.GrantMessage(entities, perm=perm).send()
 
@@ -186,7 +332,6 @@ class AthanorAccountController(AthanorController):
         if perm.lower() not in account.permissions.all():
             raise ValueError(f"{account} does not have that Permission!")
         account.permissions.remove(perm)
-        self.permissions[perm.lower()].remove(account)
         entities = {'enactor': enactor, 'account': account}
         amsg.RevokeMessage(entities, perm=perm).send()
 
@@ -203,10 +348,6 @@ class AthanorAccountController(AthanorController):
             amsg.GrantSuperMessage(entities).send()
         account.is_superuser = reverse
         account.save(update_fields=['is_superuser'])
-        if reverse:
-            self.permissions["_super"].add(account)
-        else:
-            self.permissions["_super"].remove(account)
         return reverse
 
     def access_account(self, session, account):
@@ -226,23 +367,43 @@ class AthanorAccountController(AthanorController):
             raise ValueError("Permission denied.")
         # Create a COPY of the permissions since we're going to mutilate it a lot...
 
-        perms = dict(self.permissions)
+        perms = {perm: set(holders) for perm, holders in self.backend.permissions.items()}
         message = list()
         styling = enactor.styler
+        table = styling.compiled_table(('Permission', 12, 'r'), ('Holders', None))
+        holder_width = table.widths[1]
+
+        def wrapped(perm, holders):
+            # Long holder lists continue on following rows rather than being cut off at the column width.
+            lines = textwrap.wrap(iter_to_string(holders), holder_width) or ['']
+            return [(perm, lines[0])] + [('', line) for line in lines[1:]]
+
         message.append(styling.styled_header("Permissions Hierarchy"))
-        message.append(f"|rSUPERUSERS:|n {iter_to_string(perms.pop('_super', list()))}")
+        rows = wrapped('SUPERUSERS', perms.pop('_super', list()))
         for perm in reversed(settings.PERMISSION_HIERARCHY):
             if perm.lower() in perms:
-                message.append(f"{perm:>10}: {iter_to_string(perms.pop(perm.lower(), list()))}")
-        if perms:
+                rows.extend(wrapped(perm, perms.pop(perm.lower(), list())))
+        message.extend(table.render(rows))
+        if (others := [(perm, holders) for perm, holders in perms.items() if holders]):
             message.append(styling.styled_separator("Non-Hierarchial Permissions"))
-            for perm, holders in perms.items():
-                if not holders:
-                    continue
-                message.append(f"{perm}: {iter_to_string(holders)}")
+            message.extend(table.render([row for perm, holders in others for row in wrapped(perm, holders)],
+                                        header=False))
         message.append(styling.blank_footer)
         return '\n'.join(str(l) for l in message)
 
+    def check_permissions(self, session):
+        if not (enactor := session.get_account()) or not enactor.check_lock("pperm(Admin)"):
+            raise ValueError("Permission denied.")
+        missing, stale = self.backend.check_permissions(repair=True)
+        if not missing and not stale:
+            return "Permissions index is consistent with the database."
+        message = [f"Permissions index had drifted. Repaired {len(missing)} missing and {len(stale)} stale entries."]
+        for perm, acc in missing:
+            message.append(f"Missing: {perm} - {acc}")
+        for perm, acc in stale:
+            message.append(f"Stale: {perm} - {acc}")
+        return '\n'.join(message)
+
     def list_permissions(self, session):
         if not (enactor := session.get_account()):
             raise ValueError("Permission denied.")
@@ -257,18 +418,28 @@ class AthanorAccountController(AthanorController):
         message.append(styling.blank_footer)
         return '\n'.join(str(l) for l in message)
 
-    def list_accounts(self, session):
+    def list_accounts(self, session, page=None):
         if not (enactor := session.get_account()) or not enactor.check_lock("pperm(Admin)"):
             raise ValueError("Permission denied.")
-        if not (accounts := AthanorAccount.objects.filter_family()):
+        if not self.count():
             raise ValueError("No accounts to list!")
+        try:
+            page = int(page) if page else 1
+        except ValueError:
+            raise ValueError("Page must be a number!")
+        paginator = Paginator(self.backend.list_queryset(), settings.ACCOUNT_LIST_PAGE_SIZE)
+        if not 0 < page <= paginator.num_pages:
+            raise ValueError(f"Page must be between 1 and {paginator.num_pages}!")
         styling = enactor.styler
+        table = styling.compiled_table(('Username', 18), ('Email', 26), ('Permissions', 16), ('Characters', None),
+                                       ('Banned', 6))
         message = [
             styling.styled_header(f"Account Listing")
         ]
-        for acc in accounts:
-            message.extend(acc.render_list_section(enactor, styling))
-        message.append(styling.blank_footer)
+        bans = self.backend.bans
+        message.extend(table.render((*acc.render_list_row(enactor), 'Yes' if bans.is_banned(acc) else '')
+                                    for acc in paginator.page(page)))
+        message.append(styling.styled_footer(f"Page {page} of {paginator.num_pages}"))
         return '\n'.join(str(l) for l in message)
 
     def examine_account(self, session, account):
@@ -293,41 +464,384 @@ class AthanorAccountControllerBackend(AthanorControllerBackend):
         super().__init__(frontend)
         self.id_map = dict()
         self.name_map = dict()
+        self.email_map = dict()
+        self.alias_map = dict()
+        # account id -> the (username, email, aliases) it is currently indexed under, so stale keys can be removed.
+        self.indexed_keys = dict()
         self.roles = dict()
-        self.reg_names = None
+        self.name_matcher = NameMatcher()
         self.account_typeclass = None
         self.permissions = defaultdict(set)
-        self.load()
+        self.bans = BanRegistry(self)
+        self.warmed_tags = None
+
+    def do_load(self):
+        self.update_cache()
+        self.bans.load()
+        # Permissions are Tags on AccountDB.db_tags. Watching the tag relation keeps the index current no
+        # matter what code grants or revokes them.
+        m2m_changed.connect(self.at_account_tags_changed, sender=AccountDB.db_tags.through,
+                            dispatch_uid='evmush_account_permissions')
+        pre_delete.connect(self.at_tag_delete, sender=Tag, dispatch_uid='evmush_account_permissions')
+        # No sender here: Accounts are saved as their typeclass, a proxy of AccountDB, and Django matches
+        # sender against the exact class being saved. at_account_save filters on AccountDB itself instead.
+        post_save.connect(self.at_account_save, dispatch_uid='evmush_account_superuser')
+        post_delete.connect(self.at_account_delete, dispatch_uid='evmush_account_delete')
+
+    def at_account_tags_changed(self, sender, instance, action, reverse, model, pk_set, **kwargs):
+        if action == 'pre_clear':
+            if reverse:
+                if instance.db_tagtype == 'permission' and instance.db_category is None:
+                    self.permissions.pop(instance.db_key, None)
+            elif (account := self.id_map.get(instance.pk, None)):
+                for perm, holders in self.permissions.items():
+                    if perm != '_super':
+                        holders.discard(account)
+            return
+        if action not in ('post_add', 'post_remove') or not pk_set:
+            return
+        if reverse:
+            # tag.accountdb_set.add(...) - instance is the Tag and pk_set holds Account ids.
+            if instance.db_tagtype != 'permission' or instance.db_category is not None:
+                return
+            pairs = [(instance.db_key, acc_id) for acc_id in pk_set]
+        else:
+            if not (perms := Tag.objects.filter(pk__in=pk_set, db_tagtype='permission', db_category__isnull=True)
+                    .values_list('db_key', flat=True)):
+                return
+            pairs = [(perm, instance.pk) for perm in perms]
+        for perm, acc_id in pairs:
+            if not (account := self.id_map.get(acc_id, None)):
+                continue
+            if action == 'post_add':
+                self.permissions[perm].add(account)
+            else:
+                self.permissions[perm].discard(account)
+            ONLINE.refresh_admin(account)
+
+    def at_tag_delete(self, sender, instance, **kwargs):
+        # Objects, channels and so on hold permission Tags too. Only Account ones are indexed.
+        if instance.db_tagtype != 'permission' or instance.db_category is not None or instance.db_model != 'accountdb':
+            return
+        for account in self.permissions.pop(instance.db_key, set()):
+            ONLINE.refresh_admin(account)
+
+    def at_account_save(self, sender, instance, **kwargs):
+        # This runs for every model saved anywhere in the game, so bail out as cheaply as possible.
+        if not isinstance(instance, AccountDB):
+            return
+        if not (account := self.id_map.get(instance.pk, None)):
+            return
+        # Renames and email changes made outside this controller (account.key = ...) still get reindexed.
+        username, email, aliases = self.indexed_keys[account.id]
+        if (account.username, account.email) != (username, email):
+            self.index_account(account, aliases=aliases)
+        if (update_fields := kwargs.get('update_fields', None)) and 'is_superuser' not in update_fields:
+            return
+        if account.is_superuser:
+            self.permissions["_super"].add(account)
+        else:
+            self.permissions["_super"].discard(account)
+        ONLINE.refresh_admin(account)
+
+    def at_account_delete(self, sender, instance, **kwargs):
+        # No sender, for the same reason as at_account_save.
+        if not isinstance(instance, AccountDB):
+            return
+        if not (account := self.id_map.get(instance.pk, None)):
+            return
+        self.unindex_account(account)
+        for holders in self.permissions.values():
+            holders.discard(account)
+        self.bans.forget(instance.pk)
+
+    def check_permissions(self, repair=False):
+        """
+        Compares the permissions index to the database in two queries.
+
+        Args:
+            repair (bool): Fix whatever differs.
+
+        Returns:
+            missing, stale (list, list): (perm, account) pairs that are in the database but not the index,
+                and the other way around.
+        """
+        expected = set(AccountDB.db_tags.through.objects.filter(
+            tag__db_tagtype='permission', tag__db_category__isnull=True).values_list('tag__db_key', 'accountdb_id'))
+        expected.update(('_super', acc_id) for acc_id in AccountDB.objects.filter(
+            is_superuser=True).values_list('id', flat=True))
+        indexed = {(perm, acc.id) for perm, holders in self.permissions.items() for acc in holders}
+        missing = [(perm, self.id_map[acc_id]) for perm, acc_id in expected - indexed if acc_id in self.id_map]
+        stale = [(perm, self.id_map[acc_id]) for perm, acc_id in indexed - expected if acc_id in self.id_map]
+        if repair:
+            for perm, account in missing:
+                self.permissions[perm].add(account)
+            for perm, account in stale:
+                self.permissions[perm].discard(account)
+        return missing, stale
 
     def all(self):
-        pass
+        return list(self.id_map.values())
 
     def count(self):
-        pass
-
-    def create_account(self, username, email, password, typeclass=None):
+        return len(self.id_map)
+
+    def list_queryset(self):
+        """
+        Accounts in listing order, with everything render_list_row needs fetched in bulk.
+        Permissions are Tags, so those come from db_tags.
+        """
+        return AthanorAccount.objects.filter_family().order_by('username').prefetch_related(
+            'db_tags', 'player_character_components')
+
+    def create_account(self, username, email, password, typeclass=None, ip=''):
+        """
+        Everything that can be checked up front is checked before any hashing. Once the hash is ready, the
+        Account is created on the reactor thread through the typeclass's normal create path, so bans, the
+        default channel, FIRST_LOGIN and the post-create signal all apply. Only the hashing is skipped there.
+
+        Returns:
+            Deferred: Fires with the new Account. Errbacks with ValueError.
+        """
+        if typeclass is None:
+            typeclass = self.account_typeclass
+        username = typeclass.normalize_username(username)
+        valid, errors = typeclass.validate_username(username)
+        if not valid:
+            raise ValueError(' '.join(str(err) for err in errors))
+        valid, error = typeclass.validate_password(password)
+        if not valid:
+            raise ValueError(' '.join(str(err) for err in error.messages))
+        email = AthanorAccount.objects.normalize_email(email)
+        if email.casefold() in self.email_map:
+            raise ValueError("Email is already in use by another account!")
+
+        def finish(encoded):
+            new_account = self.create_with_hash(username, email, encoded, typeclass, ip=ip)
+            self.index_created([new_account])
+            return new_account
+
+        return hash_password(password).addCallback(finish)
+
+    def create_with_hash(self, username, email, encoded, typeclass, ip=''):
+        """
+        Creates an Account around an already-encoded password, so no hashing happens on this thread.
+        """
+        with transaction.atomic():
+            return typeclass.create_account(username=username, email=email, password=EncodedPassword(encoded),
+                                            typeclass=typeclass, ip=ip)
+
+    def import_accounts(self, records, typeclass=None, batch_size=200):
+        """
+        Creates many Accounts from a stream of records, batch_size records at a time. Each batch is validated,
+        its passwords are hashed in parallel on the password pool, and its Accounts are inserted in one
+        transaction before the next batch is read, yielding to the reactor in between. Indexing happens once at
+        the end.
+
+        Args:
+            records (iterable of dict): username, email and either password or password_hash. May be a lazy
+                reader over a file; it is only consumed one batch at a time.
+            typeclass (class): Typeclass for the new Accounts. The default if not given.
+            batch_size (int): Accounts per transaction.
+
+        Returns:
+            Deferred: Fires with (created, errors), a list of Accounts and a list of error strings. Every
+                record read ends up as one or the other.
+        """
         if typeclass is None:
             typeclass = self.account_typeclass
-        new_account = typeclass.create_account(username=username, email=email, password=password)
-        self.id_map[new_account.id] = new_account
-        self.name_map[new_account.username.upper()] = new_account
-        self.update_regex()
-        for perm in new_account.permissions.all():
-            self.permissions[perm].add(new_account)
-        return new_account
-
-    def update_regex(self):
-        escape_names = [re.escape(name) for name in self.name_map.keys()]
-        self.reg_names = re.compile(r"(?i)\b(?P<found>%s)\b" % '|'.join(escape_names))
+        created, errors = list(), list()
+        batches = self._import_batches(records, typeclass, batch_size, created, errors)
+        return coiterate(batches).addCallback(lambda result: (self.index_created(created), errors))
+
+    def _import_batches(self, records, typeclass, batch_size, created, errors):
+        seen_names, seen_emails = set(), set()
+        numbered = enumerate(records, start=1)
+        while True:
+            try:
+                batch = list(islice(numbered, batch_size))
+            except ValueError as err:
+                # A malformed line ends the import, but whatever was already created stays and gets indexed.
+                errors.append(f"Stopped reading: {err}")
+                return
+            if not batch:
+                return
+            accepted = self.validate_records(batch, typeclass, errors, seen_names, seen_emails)
+            hashes = [succeed(encoded) if (encoded := self.encoded_password(record))
+                      else hash_password(record['password']) for num, username, email, record in accepted]
+            yield gatherResults(hashes, consumeErrors=True).addCallback(
+                lambda encoded, accepted=accepted: self._insert_batch(accepted, encoded, typeclass, errors, created))
+
+    def validate_records(self, batch, typeclass, errors, seen_names, seen_emails):
+        """
+        Checks a batch of import records the same way create_account checks one, with the typeclass's username
+        and password validators. Names are compared case-insensitively against the database, in one query, and
+        against every name accepted earlier in the same import.
+
+        Args:
+            batch (list): (number, record) pairs.
+            typeclass (class): The typeclass whose validators apply.
+            errors (list): Gets one error string per rejected record.
+            seen_names, seen_emails (set): Casefolded names and emails accepted so far. Updated in place.
+
+        Returns:
+            accepted (list): (number, username, email, record) for every record that passed.
+        """
+        candidates = list()
+        for num, record in batch:
+            if not isinstance(record, dict):
+                errors.append(f"Record {num}: is not a mapping of fields.")
+                continue
+            username = (record.get('username', None) or '').strip()
+            email = (record.get('email', None) or '').strip()
+            if not username or not email:
+                errors.append(f"Record {num}: needs both a username and an email.")
+                continue
+            if not (record.get('password', None) or record.get('password_hash', None)):
+                errors.append(f"Record {num} ({username}): needs a password or password_hash.")
+                continue
+            candidates.append((num, typeclass.normalize_username(username),
+                               AthanorAccount.objects.normalize_email(email), record))
+        taken = set(AccountDB.objects.annotate(name_key=Lower('username'))
+                    .filter(name_key__in={username.lower() for num, username, email, record in candidates})
+                    .values_list('name_key', flat=True))
+        accepted = list()
+        for num, username, email, record in candidates:
+            if (name_key := username.casefold()) in self.name_map or name_key in seen_names \
+                    or username.lower() in taken:
+                errors.append(f"Record {num} ({username}): username is already in use.")
+                continue
+            if (email_key := email.casefold()) in self.email_map or email_key in seen_emails:
+                errors.append(f"Record {num} ({username}): email is already in use.")
+                continue
+            valid, problems = typeclass.validate_username(username)
+            if not valid:
+                errors.append(f"Record {num} ({username}): {' '.join(str(err) for err in problems)}")
+                continue
+            if not self.encoded_password(record):
+                valid, error = typeclass.validate_password(record['password'],
+                                                           account=typeclass(username=username, email=email))
+                if not valid:
+                    errors.append(f"Record {num} ({username}): {' '.join(str(err) for err in error.messages)}")
+                    continue
+            seen_names.add(name_key)
+            seen_emails.add(email_key)
+            accepted.append((num, username, email, record))
+        return accepted
+
+    @staticmethod
+    def encoded_password(record):
+        """
+        The record's already-encoded password, if it has one. Older exports wrote the hash to the password
+        column, so a password that Django recognizes as an encoded hash counts as one too.
+        """
+        if (encoded := record.get('password_hash', None)):
+            return encoded
+        try:
+            identify_hasher(record.get('password', None) or '')
+        except ValueError:
+            return None
+        return record['password']
+
+    def _insert_batch(self, accepted, encoded, typeclass, errors, created):
+        with transaction.atomic():
+            for (num, username, email, record), password in zip(accepted, encoded):
+                try:
+                    # create_with_hash is atomic itself, so a failed record only rolls back its own savepoint.
+                    account = self.create_with_hash(username, email, password, typeclass)
+                except Exception as err:
+                    errors.append(f"Record {num} ({username}): {err}")
+                    continue
+                created.append(account)
+
+    def index_created(self, created):
+        for account in created:
+            self.index_account(account)
+            for perm in account.permissions.all():
+                self.permissions[perm].add(account)
+        return created
+
+    def export_rows(self, chunk_size=2000):
+        """
+        Streams every Account as a plain dict with a server-side cursor, without instantiating typeclasses.
+        """
+        fields = [field for field in EXPORT_FIELDS if field != 'password_hash']
+        return AthanorAccount.objects.filter_family().order_by('id').values(*fields, password_hash=F('password'))\
+            .iterator(chunk_size=chunk_size)
+
+    def index_account(self, account, aliases=None):
+        """
+        Adds an account to every in-memory lookup, or re-indexes it after its username, email or aliases changed.
+
+        Args:
+            account (AccountDB): The account.
+            aliases (iterable): Its aliases, if already known. Otherwise they're loaded from the AliasHandler.
+        """
+        self.unindex_account(account)
+        username, email = account.username, account.email
+        aliases = tuple(account.aliases.all() if aliases is None else aliases)
+        self.indexed_keys[account.id] = (username, email, aliases)
+        self.id_map[account.id] = account
+        self.name_map[username.casefold()] = account
+        if email:
+            self.email_map[email.casefold()] = account
+        for alias in aliases:
+            self.alias_map[alias.casefold()] = account
+        self.name_matcher.add(username, account)
+
+    def unindex_account(self, account):
+        if not (keys := self.indexed_keys.pop(account.id, None)):
+            return
+        username, email, aliases = keys
+        self.id_map.pop(account.id, None)
+        if self.name_map.get(username.casefold(), None) == account:
+            del self.name_map[username.casefold()]
+        if email and self.email_map.get(email.casefold(), None) == account:
+            del self.email_map[email.casefold()]
+        for alias in aliases:
+            if self.alias_map.get(alias.casefold(), None) == account:
+                del self.alias_map[alias.casefold()]
+        self.name_matcher.discard(username)
+
+    def warm_up(self):
+        """
+        Runs on a worker thread, so it only fetches plain tuples. Typeclassed Accounts are instantiated by
+        update_cache on the reactor thread, where the idmapper expects it.
+        """
+        self.warmed_tags = self.account_tags()
+
+    @staticmethod
+    def account_tags():
+        """
+        Every Account permission and alias in one query. Evennia's Tag handlers don't use prefetched
+        db_tags, so reading these through them would cost a query per Account.
+
+        Returns:
+            tags (dict): account id -> {'permission': [keys], 'alias': [keys]}
+        """
+        tags = defaultdict(lambda: {'permission': list(), 'alias': list()})
+        for acc_id, key, tagtype in AccountDB.db_tags.through.objects.filter(
+                tag__db_tagtype__in=('permission', 'alias'), tag__db_category__isnull=True)\
+                .values_list('accountdb_id', 'tag__db_key', 'tag__db_tagtype'):
+            tags[acc_id][tagtype].append(key)
+        return tags
 
     def update_cache(self):
+        if (tags := self.warmed_tags) is None:
+            tags = self.account_tags()
+        self.warmed_tags = None
         accounts = AthanorAccount.objects.filter_family()
-        self.id_map = {acc.id: acc for acc in accounts}
-        self.name_map = {acc.username.upper(): acc for acc in accounts}
-        self.update_regex()
+        self.id_map = dict()
+        self.name_map = dict()
+        self.email_map = dict()
+        self.alias_map = dict()
+        self.indexed_keys = dict()
+        self.name_matcher.rebuild(dict())
         self.permissions = defaultdict(set)
         for acc in accounts:
-            for perm in acc.permissions.all():
+            acc_tags = tags.get(acc.id, {'permission': (), 'alias': ()})
+            self.index_account(acc, aliases=acc_tags['alias'])
+            for perm in acc_tags['permission']:
                 self.permissions[perm].add(acc)
             if acc.is_superuser:
                 self.permissions["_super"].add(acc)
@@ -335,11 +849,14 @@ class AthanorAccountControllerBackend(AthanorControllerBackend):
     def rename_account(self, account, new_name):
         old_name = str(account)
         new_name = account.rename(new_name)
+        self.index_account(account)
+        ONLINE.rekey(account)
         return old_name, new_name
 
     def change_email(self, account, new_email):
         old_email = account.email
         new_email = account.set_email(new_email)
+        self.index_account(account)
         return old_email, new_email
 
     def find_account(self, search_text, exact=False):
@@ -347,13 +864,28 @@ class AthanorAccountControllerBackend(AthanorControllerBackend):
             raise ValueError("No account entered to search for!")
         if isinstance(search_text, AthanorAccount):
             return search_text
+        folded = search_text.strip().casefold()
         if '@' in search_text:
+            if (found := self.email_map.get(folded, None)):
+                return found
             found = AthanorAccount.objects.get_account_from_email(search_text).first()
             if found:
+                self.index_account(found)
                 return found
             raise ValueError(f"Cannot find a user with email address: {search_text}")
+        if (found := self.name_map.get(folded, None)) or (found := self.alias_map.get(folded, None)):
+            return found
+        if not exact:
+            # Same rule as Evennia's search_account: any username containing the text. Several candidates
+            # is an error, never a guess, since admin operations like ban and password act on the result.
+            candidates = [acc for name, acc in self.name_map.items() if folded in name]
+            if len(candidates) == 1:
+                return candidates[0]
+            if candidates:
+                raise ValueError(f"That matched multiple accounts: {', '.join(sorted(str(acc) for acc in candidates))}")
         found = search_account(search_text, exact=exact)
         if len(found) == 1:
+            self.index_account(found[0])
             return found[0]
         if not found:
             raise ValueError(f"Cannot find a user named {search_text}!")
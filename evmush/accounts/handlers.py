@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.conf import settings
 from evennia import MONITOR_HANDLER
 from athanor.utils.time import utcnow
+from athanor.utils.online import ONLINE
 from athanor.utils.link import EntitySessionHandler
 from athanor.utils.cmdsethandler import AthanorCmdSetHandler
 from athanor.utils.cmdhandler import CmdHandler
@@ -16,11 +17,17 @@ class BanHandler:
 
     def __init__(self, account):
         self.account = account
-        self.state = None
-        self.load()
+        self._state = None
+
+    @property
+    def state(self):
+        # Loaded on first use. Logins ask the account controller's BanRegistry instead.
+        if self._state is None:
+            self.load()
+        return self._state
 
     def load(self):
-        self.state = self.account.attributes.get(key='ban', category='system', default=dict())
+        self._state = self.account.attributes.get(key='ban', category='system', default=dict())
 
     def get_state(self):
         """
@@ -75,6 +82,7 @@ class AccountSessionHandler(EntitySessionHandler):
         session.uid = self.obj.pk
         session.conn_time = time.time()
         session.swap_cmdset(settings.CMDSET_SELECTSCREEN)
+        ONLINE.link_account(self.obj)
 
     def at_after_link_session(self, session, force=False, sync=False, **kwargs):
         self.obj.at_init()
@@ -107,6 +115,7 @@ class AccountSessionHandler(EntitySessionHandler):
         session.cmdset.update(init_mode=True)
 
     def at_after_unlink_session(self, session, force=False, reason=None, **kwargs):
+        ONLINE.unlink_account(self.obj)
         if not (remaining := self.all()):
             self.obj.attributes.add(key="last_active_datetime", category="system", value=timezone.now())
             self.obj.is_connected = False
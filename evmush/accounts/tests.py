@@ -0,0 +1,45 @@
+"""
+Run with `evennia test evmush.accounts` from a game directory using EvMUSH.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+from evennia.server.models import ServerConfig
+from evennia.server.signals import SIGNAL_ACCOUNT_POST_CREATE
+from evennia.utils import create
+from evennia.utils.test_resources import EvenniaTest
+
+from athanor.accounts.typeclasses import AthanorAccount
+from athanor.utils.passwords import EncodedPassword
+
+
+class TestCreateWithEncodedPassword(EvenniaTest):
+    """
+    An Account created around a password hashed elsewhere must come out the same as one from DefaultAccount.create.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.channel = create.create_channel(settings.DEFAULT_CHANNELS[0]['key'])
+        self.created = list()
+        SIGNAL_ACCOUNT_POST_CREATE.connect(self.at_post_create)
+        self.addCleanup(SIGNAL_ACCOUNT_POST_CREATE.disconnect, self.at_post_create)
+
+    def at_post_create(self, sender, **kwargs):
+        self.created.append((sender, kwargs.get('ip', None)))
+
+    def test_post_create_steps(self):
+        account = AthanorAccount.create_account(username='Encoded', email='encoded@example.com',
+                                                password=EncodedPassword(make_password('correct horse battery')),
+                                                ip='10.0.0.1')
+        self.assertEqual(self.created, [(account, '10.0.0.1')])
+        self.assertTrue(self.channel.has_connection(account))
+        self.assertTrue(account.db.FIRST_LOGIN)
+        self.assertEqual(account.db.creator_ip, '10.0.0.1')
+        self.assertTrue(account.check_password('correct horse battery'))
+
+    def test_banned_name_is_refused(self):
+        ServerConfig.objects.conf('server_bans', value=[('encoded', '', None, '', 'test ban')])
+        self.assertRaises(ValueError, AthanorAccount.create_account, username='Encoded',
+                          email='encoded@example.com', password=EncodedPassword(make_password('correct horse battery')))
+        self.assertEqual(self.created, [])
@@ -5,6 +5,8 @@ from evennia.utils.utils import time_format
 import athanor
 from athanor.accounts.handlers import AccountCmdSetHandler
 from athanor.accounts.handlers import BanHandler, AccountCmdHandler, AccountAppearanceHandler
+from athanor.utils.alerts import format_system_msg
+from athanor.utils.passwords import EncodedPassword
 
 
 class AthanorAccount(DefaultAccount):
@@ -41,7 +43,7 @@ class AthanorAccount(DefaultAccount):
         """
         # check for both if the account has been banned and whether the ban is still valid.
         # it's still valid if banned > now.
-        if (bstate := self.ban.get_state()):
+        if (bstate := athanor.api()['controller_manager'].get('account').ban_state(self)):
             session.msg(f"This account has been banned for: {bstate['reason']} until {bstate['until'].strftime('%c')}. "
                         f"{time_format(bstate['left'].total_seconds(), style=2)} remains. If you wish to appeal, contact staff via other means.")
             return
@@ -79,32 +81,38 @@ class AthanorAccount(DefaultAccount):
         return new_email
 
     def system_msg(self, text=None, system_name=None, enactor=None):
-        sysmsg_border = self.options.sys_msg_border
-        sysmsg_text = self.options.sys_msg_text
-        formatted_text = f"|{sysmsg_border}-=<|n|{sysmsg_text}{system_name.upper()}|n|{sysmsg_border}>=-|n {text}"
+        formatted_text = format_system_msg(text, system_name, self.options.sys_msg_border,
+                                           self.options.sys_msg_text)
         self.msg(text=formatted_text, system_name=system_name, original_text=text)
 
     def receive_template_message(self, text, msgobj, target):
         self.system_msg(text=text, system_name=msgobj.system_name)
 
-    def render_list_section(self, enactor, styling):
+    def render_list_row(self, enactor):
         """
-        Called by AccountController's list_accounts method. Renders this account
-        on the list.
+        Called by AccountController's list_accounts method. Returns the cell values for this
+        account's row in the compiled account table.
         """
-        return [
-            styling.styled_separator(self.username),
-            f"|wEmail|n: {self.email}",
-            f"|wLast Login|n: Last login here!",
-            f"|wPermissions|n: {', '.join(self.permissions.all())} (Superuser: {self.is_superuser})",
-            f"|wCharacters|n: {', '.join(str(c) for c in self.characters())}"
-        ]
+        if 'db_tags' in getattr(self, '_prefetched_objects_cache', dict()):
+            # list_accounts prefetches these, so don't spend a query per account on them.
+            perms = ', '.join(tag.db_key for tag in self.db_tags.all() if tag.db_tagtype == 'permission')
+            characters = [char for char in self.player_character_components.all() if char.db_is_active]
+        else:
+            perms = ', '.join(self.permissions.all())
+            characters = self.characters()
+        if self.is_superuser:
+            perms = f"SUPER {perms}" if perms else "SUPER"
+        return (self.username, self.email, perms, ', '.join(str(c) for c in characters))
 
     def __str__(self):
         return self.key
 
     @classmethod
     def create_account(cls, *args, **kwargs):
+        """
+        DefaultAccount.create, raising ValueError instead of returning errors. The password may be an
+        EncodedPassword, in which case it's stored without being hashed here.
+        """
         if not (email := kwargs.get('email', '')):
             raise ValueError("Must include an email!")
         if AthanorAccount.objects.filter_family(email__iexact=email).count():
@@ -113,7 +121,21 @@ class AthanorAccount(DefaultAccount):
         if account:
             return account
         else:
-            raise ValueError(errors)
+            raise ValueError(' '.join(str(err) for err in errors))
+
+    @classmethod
+    def validate_password(cls, password, account=None):
+        # An EncodedPassword was validated before it was hashed. The validators can't judge the hash itself.
+        if isinstance(password, EncodedPassword):
+            return True, None
+        return super().validate_password(password, account=account)
+
+    def set_password(self, password, **kwargs):
+        if isinstance(password, EncodedPassword):
+            self.password = str(password)
+            self._password = None
+            return
+        super().set_password(password, **kwargs)
 
     def rename(self, new_name):
         new_name = self.normalize_username(new_name)
@@ -1,6 +1,6 @@
 import re
 from django.conf import settings
-from django.db.models import F, Q
+from django.db.models import Q
 
 
 from evennia.locks.lockhandler import LockException
@@ -18,6 +18,7 @@ from athanor.utils.text import clean_and_ansi
 from athanor.models import BBSBoardDB, BBSPostDB, BBSPostRead
 from athanor.bbs import messages as fmsg
 from athanor.bbs.handlers import BoardAcccessHandler
+from athanor.bbs.unread import at_post_create, unread_queryset
 
 
 class DefaultBoard(BBSBoardDB, metaclass=TypeclassBase):
@@ -62,6 +63,7 @@ class DefaultBoard(BBSBoardDB, metaclass=TypeclassBase):
         order = self.next_post_number
         new_post = self.post_class.create(self, poster, subject, text, date, order)
         self.next_post_number = order + 1
+        at_post_create(new_post)
         return new_post
 
     @property
@@ -101,8 +103,7 @@ class DefaultBoard(BBSBoardDB, metaclass=TypeclassBase):
             return False
 
     def unread_posts(self, account):
-        return self.posts.exclude(read__account=account, date_modified__lte=F('read__date_read')).order_by(
-            'order')
+        return unread_queryset(account, [self]).order_by('db_order')
 
     def display_permissions(self, looker=None):
         if not looker:
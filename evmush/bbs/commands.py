@@ -1,7 +1,8 @@
 from athanor.commands.command import AthanorCommand
+from evmush.utils.querywatch import QueryWatchMixin
 
 
-class BBSCommand(AthanorCommand):
+class BBSCommand(QueryWatchMixin, AthanorCommand):
     """
     Class for the Board System commands.
     """
@@ -241,8 +242,9 @@ class CmdBBSRead(BBSCommand):
             unread'), in any combination or order - duplicates will not be shown.
         @fread/next - shows first available unread message.
         @fread/new - Same as /next.
-        @fread/catchup <board> - Mark all threads on a board as read. use /catchup all to
-            mark the entire bbs as read.
+        @fread/catchup <board or category>[,<board or category>...] - Mark all threads on
+            boards as read. A category means all of its boards. Use /catchup all to mark the
+            entire bbs as read.
         @fread/scan - Lists unread messages in compact form.
     """
     key = '@fread'
@@ -258,24 +260,7 @@ class CmdBBSRead(BBSCommand):
         return self.msg(self.controller.display_posts(self.session, board, posts))
 
     def switch_catchup(self):
-        if not self.args:
-            raise ValueError("Usage: +bbcatchup <board or all>")
-        if self.args.lower() == 'all':
-            boards = self.controller.visible_boards(self.caller, check_admin=True)
-        else:
-            boards = list()
-            for arg in self.lhslist:
-                found_board = self.controller.find_board(self.caller, arg)
-                if found_board not in boards:
-                    boards.append(found_board)
-        for board in boards:
-            if board.mandatory:
-                self.msg("Cannot skip a Mandatory board!", system_alert=self.system_name)
-                continue
-            unread = board.unread_posts(self.account)
-            for post in unread:
-                post.update_read(self.account)
-            self.msg(f"Skipped {len(unread)} posts on Board '{board.prefix_order} - {board.key}'")
+        self.msg(self.controller.catchup(self.session, self.lhslist), system_alert=self.system_name)
 
     def switch_scan(self):
         boards = self.controller.visible_boards(self.caller, check_admin=True)
@@ -1,14 +1,22 @@
+from collections import namedtuple
+
+from django.db.models import Count, Exists, OuterRef, Subquery
+
 from evennia.utils.logger import log_trace
 from evennia.utils.utils import class_from_module
 from evennia.utils.ansi import ANSIString
 
-from athanor.utils.text import partial_match
+from athanor.utils.text import PrefixIndex
 from athanor.controllers.base import AthanorController
 from athanor.utils.time import utcnow
 
-from athanor_bbs.models import BBSCategoryBridge, BBSBoardBridge, BBSPost, BBSPostRead
+from athanor_bbs.models import BBSCategoryBridge, BBSBoardBridge, BBSPostRead
 from athanor_bbs.gamedb import AthanorBBSCategory, AthanorBBSBoard, HasBoardOps
 from athanor_bbs import messages as fmsg
+from athanor.bbs.unread import unread_counts, at_post_edit, mark_read, mark_boards_read
+from evmush.models import BoardDB, BBSPost
+
+BoardListing = namedtuple('BoardListing', ['board', 'member', 'posts', 'unread', 'perms'])
 
 
 class AthanorBBSController(HasBoardOps, AthanorController):
@@ -31,6 +39,9 @@ class AthanorBBSController(HasBoardOps, AthanorController):
             log_trace()
             self.board_typeclass = AthanorBBSBoard
 
+        self.category_index = PrefixIndex(self.categories())
+        self.board_index = None
+
     def parent_position(self, user, position):
         return user.lock_check(f"pperm(Admin)")
 
@@ -51,6 +62,7 @@ class AthanorBBSController(HasBoardOps, AthanorController):
     def create_category(self, session, name, abbr=''):
         enactor = self._parent_operator(session)
         new_category = self.category_typeclass.create_bbs_category(key=name, abbr=abbr)
+        self.category_index.add(new_category)
         entities = {'enactor': enactor, 'target': new_category}
         fmsg.Create(entities).send()
         return new_category
@@ -62,9 +74,7 @@ class AthanorBBSController(HasBoardOps, AthanorController):
             return category
         if isinstance(category, BBSCategoryBridge):
             return category.db_script
-        if not (candidates := self.visible_categories(user)):
-            raise ValueError("No Board Categories visible!")
-        if not (found := partial_match(category, candidates)):
+        if not (found := self.category_index.match(category, check=lambda cat: cat.is_visible(user))):
             raise ValueError(f"Category '{category}' not found!")
         return found
 
@@ -74,6 +84,8 @@ class AthanorBBSController(HasBoardOps, AthanorController):
         old_name = category.fullname
         operation = getattr(category, oper)
         new_name = operation(new)
+        self.category_index.add(category)
+        self.invalidate_board_index()
         entities = {'enactor': enactor, 'target': category}
         msg(entities, old_name=old_name).send()
 
@@ -94,7 +106,9 @@ class AthanorBBSController(HasBoardOps, AthanorController):
             raise ValueError("Must provide exact prefix for verification!")
         entities = {'enactor': enactor, 'target': category_found}
         fmsg.Delete(entities).send()
+        self.category_index.discard(category_found)
         category_found.delete()
+        self.invalidate_board_index()
 
     def lock_category(self, session, category, new_locks):
         enactor = self._enactor(session)
@@ -110,6 +124,21 @@ class AthanorBBSController(HasBoardOps, AthanorController):
         return AthanorBBSBoard.objects.filter_family().order_by('bbs_board_bridge__db_category__db_name',
                                                                   'bbs_board_bridge__db_order')
 
+    def boards_by_prefix(self):
+        """
+        Every board keyed by its upper-cased prefix_order (like 'AB3'), rebuilt after invalidate_board_index().
+        """
+        if self.board_index is None:
+            self.board_index = {board.prefix_order.upper(): board for board in self.boards()}
+        return self.board_index
+
+    def invalidate_board_index(self):
+        """
+        Call whenever a board's prefix_order may have changed: board create, rename, reorder or delete, and
+        category prefix changes.
+        """
+        self.board_index = None
+
     def visible_boards(self, user):
         return [board for board in self.boards() if board.check_position(user, 'reader')]
 
@@ -125,10 +154,9 @@ class AthanorBBSController(HasBoardOps, AthanorController):
             return find_name
         if isinstance(find_name, BBSBoardBridge):
             return find_name.db_script
-        if not (boards := self.visible_boards(user)):
-            raise ValueError("No applicable BBS Boards.")
-        board_dict = {board.prefix_order.upper(): board for board in boards}
-        if not (found := board_dict.get(find_name.upper(), None)):
+        # Boards the user can't read are reported exactly like boards that don't exist.
+        if not (found := self.boards_by_prefix().get(find_name.upper(), None)) \
+                or not found.check_position(user, 'reader'):
             raise ValueError("Board '%s' not found!" % find_name)
         return found
 
@@ -139,6 +167,7 @@ class AthanorBBSController(HasBoardOps, AthanorController):
             raise ValueError("Permission denied!")
         typeclass = self.board_typeclass
         new_board = typeclass.create_bbs_board(key=name, order=order, category=category)
+        self.invalidate_board_index()
         entities = {'enactor': enactor, 'target': new_board}
         fmsg.Create(entities).send()
         return new_board
@@ -148,6 +177,7 @@ class AthanorBBSController(HasBoardOps, AthanorController):
         board = self.find_board(enactor, board)
         if not board.parent_position(enactor, 'operator'):
             raise ValueError("Permission denied!")
+        self.invalidate_board_index()
 
     def rename_board(self, session, name=None, new_name=None):
         enactor = self._enactor(session)
@@ -156,6 +186,7 @@ class AthanorBBSController(HasBoardOps, AthanorController):
             raise ValueError("Permission denied!")
         old_name = board.key
         board.change_key(new_name)
+        self.invalidate_board_index()
         entities = {'enactor': enactor, 'target': board}
         fmsg.Rename(entities, old_name=old_name).send()
 
@@ -166,6 +197,7 @@ class AthanorBBSController(HasBoardOps, AthanorController):
             raise ValueError("Permission denied!")
         old_order = board.order
         new_order = board.change_order(order)
+        self.invalidate_board_index()
         entities = {'enactor': enactor, 'target': board}
         fmsg.Order(entities, old_order=old_order).send()
 
@@ -200,7 +232,9 @@ class AthanorBBSController(HasBoardOps, AthanorController):
         post = board.find_post(enactor, post)
         if not post.can_edit(enactor):
             raise ValueError("Permission denied.")
+        previous_modified = post.db_date_modified
         post.edit_post(find=seek_text, replace=replace_text)
+        at_post_edit(post, previous_modified)
 
     def config_category(self, session, category, config_op, config_val):
         category = self.find_category(session, category)
@@ -233,30 +267,85 @@ class AthanorBBSController(HasBoardOps, AthanorController):
         styling = user.styler
         return styling.styled_columns(f"{'ID':<6}{'Name':<31}{'Mem':<4}{'#Mess':>6}{'#Unrd':>6} Perm")
 
-    def render_board_row(self, enactor, account, board):
-        bri = board.bridge
-        if board.db.mandatory:
-            member = 'MND'
-        else:
-            member = 'No' if account in board.ignore_list else 'Yes'
-        count = bri.posts.count()
-        unread = board.unread_posts(account).count()
-        perms = board.display_permissions(enactor)
-        return f"{board.prefix_order:<6}{board.key:<31}{member:<4} {count:>5} {unread:>5} {perms}"
+    def board_permissions(self, enactor, boards):
+        """
+        The Perm column of the board list for every board at once. The Admin check that grants everything
+        is made once for the viewer rather than three times per board.
+
+        Returns:
+            perms (dict): board id -> a string like 'RPA' or 'R  '.
+        """
+        if enactor.locks.check_lockstring(enactor, 'dummy:perm(Admin)'):
+            return {board.id: 'RPA' for board in boards}
+        account = enactor.account
+        return {board.id: ''.join(letter if board.locks.check(account, mode) else ' '
+                                  for mode, letter in (('read', 'R'), ('post', 'P'), ('admin', 'A')))
+                for board in boards}
+
+    def mandatory_boards(self, boards):
+        """
+        Returns:
+            mandatory (set): Ids of the boards whose mandatory Attribute is set. One query for all of them.
+        """
+        return {board_id for board_id, value in BoardDB.db_attributes.through.objects
+                .filter(boarddb_id__in=[board.id for board in boards], attribute__db_key='mandatory',
+                        attribute__db_category__isnull=True)
+                .values_list('boarddb_id', 'attribute__db_value') if value}
+
+    def board_listing(self, enactor, account, boards=None):
+        """
+        Everything the board list shows, in a fixed number of queries however many boards there are: one
+        annotated query for post counts and membership, one for the mandatory flags, one fetch of unread
+        counters, and in-memory lock checks. Each board's category and prefix come from its owner foreign key
+        on the shared board instance; that is fetched the first time a board is used and cached on the
+        instance after that, not re-read on every listing.
+
+        Args:
+            enactor (Character): The viewer. Their locks decide which boards are listed.
+            account (AccountDB): Whose membership and unread counts.
+            boards (list): Boards to list. Defaults to those visible to enactor.
+
+        Returns:
+            listing (list of BoardListing): In the order of boards.
+        """
+        if boards is None:
+            boards = self.visible_boards(enactor)
+        if not boards:
+            return list()
+        post_counts = BBSPost.objects.filter(db_board=OuterRef('pk')).order_by().values('db_board')\
+            .annotate(total=Count('id')).values('total')
+        ignoring = BoardDB.ignoring.through.objects.filter(boarddb_id=OuterRef('pk'), accountdb_id=account.id)
+        stats = {board_id: (posts or 0, ignored) for board_id, posts, ignored in
+                 BoardDB.objects.filter(id__in=[board.id for board in boards])
+                 .annotate(total_posts=Subquery(post_counts), ignored=Exists(ignoring))
+                 .values_list('id', 'total_posts', 'ignored')}
+        mandatory = self.mandatory_boards(boards)
+        unread = unread_counts(account, boards)
+        perms = self.board_permissions(enactor, boards)
+        listing = list()
+        for board in boards:
+            posts, ignored = stats.get(board.id, (0, False))
+            member = 'MND' if board.id in mandatory else ('No' if ignored else 'Yes')
+            listing.append(BoardListing(board, member, posts, unread[board.id], perms[board.id]))
+        return listing
+
+    def render_board_row(self, row):
+        board = row.board
+        return f"{board.prefix_order:<6}{board.key:<31}{row.member:<4} {row.posts:>5} {row.unread:>5} {row.perms}"
 
     def render_board_list(self, session):
         enactor = self._enactor(session)
-        boards = self.visible_boards(enactor)
+        listing = self.board_listing(enactor, session.account)
         styling = enactor.styler
         message = list()
         message.append(styling.styled_header('BBS Boards'))
         message.append(self.render_board_columns(enactor))
         message.append(styling.blank_separator)
         this_cat = None
-        for board in boards:
-            if this_cat != (this_cat := board.category):
+        for row in listing:
+            if this_cat != (this_cat := row.board.category):
                 message.append(styling.styled_separator(this_cat.cname))
-            message.append(self.render_board_row(enactor, session.account, board))
+            message.append(self.render_board_row(row))
         message.append(styling.blank_footer)
         return '\n'.join(str(l) for l in message)
 
@@ -270,11 +359,12 @@ class AthanorBBSController(HasBoardOps, AthanorController):
         message.append(styling.styled_columns(f"{'ID':<10}Rd {'Title':<35}{'PostDate':<12}Author"))
         message.append(styling.blank_separator)
         unread = set(board.unread_posts(session.account))
-        for post in posts:
+        posts = list(posts)
+        post_dates = styling.localize_timestrings([post.date_created for post in posts], time_format='%b %d %Y')
+        for post, post_date in zip(posts, post_dates):
             id = f"{post.board.db_script.prefix_order}/{post.order}"
             rd = 'U ' if post in unread else ''
             subject = post.cname[:34].ljust(34)
-            post_date = styling.localize_timestring(post.date_created, time_format='%b %d %Y')
             author = post.character if post.character else 'N/A'
             message.append(f"{id:<10}{rd:<3}{subject:<35}{post_date:<12}{author}")
         message.append(styling.blank_footer)
@@ -301,5 +391,50 @@ class AthanorBBSController(HasBoardOps, AthanorController):
         styling = enactor.styler
         for post in posts:
             message.append(self.render_post(session, enactor, styling, post))
-            post.update_read(session.account)
-        return '\n'.join(str(l) for l in message)
\ No newline at end of file
+        mark_read(session.account, posts)
+        return '\n'.join(str(l) for l in message)
+
+    def catchup(self, session, targets=None):
+        """
+        Marks boards read. Each target may be a board or a category (meaning all of its boards visible to
+        the enactor), or 'all' for every visible board. Mandatory boards are skipped.
+
+        Args:
+            session (ServerSession): The reader.
+            targets (list of str): What to mark read.
+
+        Returns:
+            report (str)
+        """
+        enactor = self._enactor(session)
+        if not targets:
+            raise ValueError("Usage: +bbcatchup <board or category or all>")
+        visible = self.visible_boards(enactor)
+        if any(target.lower() == 'all' for target in targets):
+            boards = visible
+        else:
+            boards = list()
+            for target in targets:
+                try:
+                    found = [self.find_board(enactor, target)]
+                except ValueError:
+                    try:
+                        category = self.find_category(enactor, target)
+                    except ValueError:
+                        raise ValueError(f"Board '{target}' not found!")
+                    found = [board for board in visible if board.category == category]
+                boards.extend(board for board in found if board not in boards)
+        mandatory = self.mandatory_boards(boards)
+        message = [f"Cannot skip Mandatory Board '{board.prefix_order} - {board.key}'!"
+                   for board in boards if board.id in mandatory]
+        if not (boards := [board for board in boards if board.id not in mandatory]):
+            if not message:
+                message.append("Nothing to skip. All caught up!")
+            return '\n'.join(message)
+        skipped = mark_boards_read(session.account, boards)
+        for board in boards:
+            if (count := skipped.get(board.id, 0)):
+                message.append(f"Skipped {count} posts on Board '{board.prefix_order} - {board.key}'")
+        if not skipped:
+            message.append("Nothing to skip. All caught up!")
+        return '\n'.join(message)
\ No newline at end of file
@@ -3,6 +3,7 @@ from evennia.typeclasses.managers import TypeclassManager
 
 from athanor.models import BBSPostDB
 from athanor.utils.time import utcnow
+from athanor.bbs.unread import mark_read
 
 
 class DefaultPost(BBSPostDB, metaclass=TypeclassBase):
@@ -34,9 +35,7 @@ class DefaultPost(BBSPostDB, metaclass=TypeclassBase):
         self.text = self.text.replace(find, replace)
 
     def update_read(self, account):
-        acc_read, created = self.read.get_or_create(account=account)
-        acc_read.date_read = utcnow()
-        acc_read.save()
+        mark_read(account, [self])
 
     def fullname(self):
         return f"BBS Post: ({self.db_board.prefix_order}/{self.db_order}): {self.name}"
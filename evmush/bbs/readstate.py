@@ -0,0 +1,311 @@
+"""
+Compact BBS read state: per (account, board), a high-water mark plus a bitmap of posts read above it.
+
+Post numbers (db_order) are dense small integers, so a reader who keeps up has a high-water mark and an empty
+bitmap, and even a sporadic reader needs a few bytes. Bitmaps are Python ints while in use, which makes
+unread counting and set operations a handful of big-integer operations rather than queries over one row per
+post. They're stored zlib-compressed. Enable with settings.BBS_READ_STORE = 'bitmap'.
+"""
+import zlib
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import F, Max, Min, Q
+
+from evmush.models import BBSPost, BBSPostRead, BBSReadState
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+class ReadBitmap:
+    """
+    The set of post numbers an account has read on one board.
+
+    Args:
+        high_water (int): Every post numbered below this is read.
+        bits (int): Bit n set means post high_water + n is read.
+    """
+    __slots__ = ('high_water', 'bits')
+
+    def __init__(self, high_water=0, bits=0):
+        self.high_water = high_water
+        self.bits = bits
+        self.normalize()
+
+    @classmethod
+    def from_orders(cls, orders):
+        bits = 0
+        for order in orders:
+            bits |= 1 << order
+        return cls(0, bits)
+
+    @classmethod
+    def from_db(cls, high_water, data):
+        data = bytes(data or b'')
+        return cls(high_water, int.from_bytes(zlib.decompress(data), 'little') if data else 0)
+
+    def to_db(self):
+        if not self.bits:
+            return self.high_water, b''
+        return self.high_water, zlib.compress(self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little'))
+
+    def as_int(self):
+        """
+        The whole set as one int, bit n for post n.
+        """
+        return ((1 << self.high_water) - 1) | (self.bits << self.high_water)
+
+    def normalize(self):
+        """
+        Absorbs any run of read posts just above the high-water mark into it.
+        """
+        if (run := (~self.bits & (self.bits + 1)).bit_length() - 1):
+            self.bits >>= run
+            self.high_water += run
+
+    def __contains__(self, order):
+        if order < self.high_water:
+            return True
+        return bool(self.bits >> (order - self.high_water) & 1)
+
+    def __eq__(self, other):
+        return isinstance(other, ReadBitmap) and (self.high_water, self.bits) == (other.high_water, other.bits)
+
+    def __len__(self):
+        return self.high_water + popcount(self.bits)
+
+    def __or__(self, other):
+        return ReadBitmap.from_int(self.as_int() | other.as_int())
+
+    def __and__(self, other):
+        return ReadBitmap.from_int(self.as_int() & other.as_int())
+
+    def __sub__(self, other):
+        return ReadBitmap.from_int(self.as_int() & ~other.as_int())
+
+    @classmethod
+    def from_int(cls, bits):
+        return cls(0, bits)
+
+    def mark(self, orders):
+        for order in orders:
+            if order >= self.high_water:
+                self.bits |= 1 << (order - self.high_water)
+        self.normalize()
+
+    def mark_through(self, order):
+        """
+        Marks every post up to and including order read.
+        """
+        if order >= self.high_water:
+            self.bits >>= order + 1 - self.high_water
+            self.high_water = order + 1
+            self.normalize()
+
+    def unmark(self, order):
+        """
+        Marks a post unread again, such as after it's edited.
+        """
+        if order >= self.high_water:
+            self.bits &= ~(1 << (order - self.high_water))
+            return
+        # Lower the mark to the post itself. The rest of what it covered moves into the bitmap.
+        above = self.high_water - order - 1
+        self.bits = (self.bits << (above + 1)) | (((1 << above) - 1) << 1)
+        self.high_water = order
+
+    def unread(self, existing):
+        """
+        Args:
+            existing (int): Bitmap of the post numbers that exist on the board, as from board_bitmaps().
+
+        Returns:
+            unread (int): Bitmap of those that are unread.
+        """
+        return existing & ~self.as_int()
+
+    def count_unread(self, existing):
+        return popcount((existing >> self.high_water) & ~self.bits)
+
+
+def orders_of(bits):
+    """
+    Post numbers in a bitmap, ascending.
+    """
+    orders = list()
+    while bits:
+        low = bits & -bits
+        orders.append(low.bit_length() - 1)
+        bits ^= low
+    return orders
+
+
+def board_bitmaps(board_ids):
+    """
+    Posts are never deleted, so each board's post numbers are the dense range between its lowest and highest.
+    That takes one grouped query returning a row per board, whatever the number of posts.
+
+    Returns:
+        existing (dict): board id -> bitmap of the post numbers on it.
+    """
+    existing = defaultdict(int)
+    for board_id, low, high in BBSPost.objects.filter(db_board_id__in=board_ids).order_by()\
+            .values('db_board_id').annotate(low=Min('db_order'), high=Max('db_order'))\
+            .values_list('db_board_id', 'low', 'high'):
+        existing[board_id] = ((1 << (high + 1)) - 1) & ~((1 << low) - 1)
+    return existing
+
+
+def load_states(account, board_ids):
+    """
+    Returns:
+        states (dict): board id -> ReadBitmap, for every board given. One query.
+    """
+    states = {board_id: ReadBitmap() for board_id in board_ids}
+    for board_id, high_water, data in BBSReadState.objects.filter(account=account, board_id__in=board_ids)\
+            .values_list('board_id', 'high_water', 'exceptions'):
+        states[board_id] = ReadBitmap.from_db(high_water, data)
+    return states
+
+
+def upsert_states(rows):
+    """
+    Saves unsaved BBSReadState rows, updating those whose (account, board) already exists: one SELECT, one
+    bulk_update and one bulk_create, which works on every database and Django version EvMUSH supports.
+    """
+    if not rows:
+        return
+    existing = {(account_id, board_id): state_id for state_id, account_id, board_id in BBSReadState.objects.filter(
+        account_id__in={row.account_id for row in rows}, board_id__in={row.board_id for row in rows})
+        .values_list('id', 'account_id', 'board_id')}
+    updates, inserts = list(), list()
+    for row in rows:
+        if (state_id := existing.get((row.account_id, row.board_id), None)):
+            row.id = state_id
+            updates.append(row)
+        else:
+            inserts.append(row)
+    with transaction.atomic():
+        BBSReadState.objects.bulk_update(updates, ['high_water', 'exceptions'], batch_size=500)
+        BBSReadState.objects.bulk_create(inserts, batch_size=500)
+
+
+def save_states(account, states):
+    """
+    Upserts read states.
+
+    Args:
+        account (AccountDB): Whose.
+        states (dict): board id -> ReadBitmap.
+    """
+    rows = list()
+    for board_id, state in states.items():
+        high_water, data = state.to_db()
+        rows.append(BBSReadState(account=account, board_id=board_id, high_water=high_water, exceptions=data))
+    upsert_states(rows)
+
+
+def unread_counts(account, board_ids):
+    """
+    Returns:
+        counts (dict): board id -> unread posts. Two queries, whatever the number of boards.
+    """
+    existing = board_bitmaps(board_ids)
+    return {board_id: state.count_unread(existing[board_id])
+            for board_id, state in load_states(account, board_ids).items()}
+
+
+def unread_orders(account, board):
+    """
+    Returns:
+        orders (list): Unread post numbers on board, ascending.
+    """
+    state = load_states(account, [board.id])[board.id]
+    return orders_of(state.unread(board_bitmaps([board.id])[board.id]))
+
+
+def mark_read(account, posts):
+    """
+    Returns:
+        newly_read (int): How many of the posts were unread before.
+    """
+    by_board = defaultdict(list)
+    for post in posts:
+        by_board[post.db_board_id].append(post.db_order)
+    if not by_board:
+        return 0
+    states = load_states(account, by_board.keys())
+    newly_read = 0
+    for board_id, orders in by_board.items():
+        before = len(states[board_id])
+        states[board_id].mark(orders)
+        newly_read += len(states[board_id]) - before
+    save_states(account, states)
+    return newly_read
+
+
+def mark_boards_read(account, board_ids):
+    """
+    Returns:
+        skipped (dict): board id -> how many posts were unread there.
+    """
+    existing = board_bitmaps(board_ids)
+    states = load_states(account, board_ids)
+    skipped = dict()
+    for board_id, state in states.items():
+        if (count := state.count_unread(existing[board_id])):
+            skipped[board_id] = count
+        if existing[board_id]:
+            state.mark_through(existing[board_id].bit_length() - 1)
+    save_states(account, states)
+    return skipped
+
+
+def at_post_edit(post):
+    """
+    An edited post becomes unread again for everyone who had read it. Only states that can hold the post
+    are decoded: those whose high-water mark is above it, or that have any exceptions at all.
+    """
+    changed = list()
+    for state_row in BBSReadState.objects.filter(Q(high_water__gt=post.db_order) | ~Q(exceptions=b''),
+                                                 board_id=post.db_board_id):
+        state = ReadBitmap.from_db(state_row.high_water, state_row.exceptions)
+        if post.db_order in state:
+            state.unmark(post.db_order)
+            state_row.high_water, state_row.exceptions = state.to_db()
+            changed.append(state_row)
+    BBSReadState.objects.bulk_update(changed, ['high_water', 'exceptions'], batch_size=500)
+
+
+def migrate_post_reads(batch_size=1000):
+    """
+    Builds BBSReadState rows from existing BBSPostRead rows. Reads older than a post's last edit are left out,
+    as BBSPostRead treats those posts as unread. Safe to run again; states are rebuilt, not merged. The
+    BBSPostRead rows are left in place.
+
+    Returns:
+        migrated (int): How many (account, board) states were written.
+    """
+    reads = BBSPostRead.objects.filter(date_read__gte=F('post__db_date_modified'))\
+        .order_by('account_id', 'post__db_board_id')\
+        .values_list('account_id', 'post__db_board_id', 'post__db_order').iterator(chunk_size=batch_size * 10)
+    rows = list()
+    migrated = 0
+    for (account_id, board_id), group in groupby(reads, key=lambda row: (row[0], row[1])):
+        high_water, data = ReadBitmap.from_orders(row[2] for row in group).to_db()
+        rows.append(BBSReadState(account_id=account_id, board_id=board_id, high_water=high_water, exceptions=data))
+        if len(rows) >= batch_size:
+            migrated += _save_migrated(rows)
+    if rows:
+        migrated += _save_migrated(rows)
+    return migrated
+
+
+def _save_migrated(rows):
+    upsert_states(rows)
+    count = len(rows)
+    rows.clear()
+    return count
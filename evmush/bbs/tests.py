@@ -0,0 +1,49 @@
+"""
+Run with `evennia test evmush.bbs` from a game directory using EvMUSH.
+"""
+import random
+from unittest import TestCase
+
+from athanor.bbs.readstate import ReadBitmap, orders_of
+
+
+class TestReadBitmap(TestCase):
+    """
+    ReadBitmap checked against plain sets of post numbers.
+    """
+
+    def setUp(self):
+        self.random = random.Random(0)
+
+    def random_orders(self):
+        return set(self.random.sample(range(64), self.random.randint(0, 40)))
+
+    def test_round_trips(self):
+        for _ in range(200):
+            orders = self.random_orders()
+            bitmap = ReadBitmap.from_orders(orders)
+            self.assertEqual(set(orders_of(bitmap.as_int())), orders)
+            self.assertEqual(ReadBitmap.from_db(*bitmap.to_db()), bitmap)
+            self.assertEqual(len(bitmap), len(orders))
+
+    def test_set_operations(self):
+        for _ in range(200):
+            left, right = self.random_orders(), self.random_orders()
+            a, b = ReadBitmap.from_orders(left), ReadBitmap.from_orders(right)
+            self.assertEqual(a | b, ReadBitmap.from_orders(left | right))
+            self.assertEqual(a & b, ReadBitmap.from_orders(left & right))
+            self.assertEqual(a - b, ReadBitmap.from_orders(left - right))
+
+    def test_set_operations_keep_high_water(self):
+        a, b = ReadBitmap.from_orders(range(10)), ReadBitmap.from_orders({3, 12})
+        self.assertEqual((a | b).high_water, 10)
+        self.assertEqual(set(orders_of((a - b).as_int())), set(range(10)) - {3})
+        self.assertEqual(set(orders_of((a & b).as_int())), {3})
+
+    def test_unread(self):
+        read = ReadBitmap.from_orders({0, 1, 2, 5})
+        existing = (1 << 8) - 1
+        self.assertEqual(orders_of(read.unread(existing)), [3, 4, 6, 7])
+        self.assertEqual(read.count_unread(existing), 4)
+        read.unmark(1)
+        self.assertEqual(orders_of(read.unread(existing)), [1, 3, 4, 6, 7])
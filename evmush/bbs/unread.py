@@ -0,0 +1,184 @@
+"""
+Maintained per-(account, board) unread counters.
+
+A counter row is computed the first time a listing asks for it, then kept current by the hooks below as posts
+are created, edited and read, so that a board list is answered by one fetch instead of a count per board.
+Nothing here handles posts being deleted or moved between boards; nothing in EvMUSH does either yet.
+
+With settings.BBS_READ_STORE = 'bitmap', read state lives in evmush.bbs.readstate instead. Counting there is
+already cheap, so these functions pass straight through to it and the counters are neither read nor kept
+current. Switching back to 'posts' therefore needs the stale counters cleared first; see the setting.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Greatest
+
+from evmush.models import BBSPost, BBSPostRead, BBSUnreadCount
+from evmush.utils.time import utcnow
+from evmush.bbs import readstate
+
+
+def bitmap_store():
+    return getattr(settings, 'BBS_READ_STORE', 'posts') == 'bitmap'
+
+
+def _board_ids(boards):
+    return [getattr(board, 'id', board) for board in boards]
+
+
+def unread_queryset(account, boards):
+    """
+    Posts on the given boards that the account hasn't read since they were last modified.
+    """
+    if bitmap_store():
+        # Everything from the high-water mark up, less the few posts read above it. Listing the unread posts
+        # themselves could need more query parameters than SQLite allows for a new reader of a big board.
+        found = Q(pk__in=[])
+        for board_id, state in readstate.load_states(account, _board_ids(boards)).items():
+            board_unread = Q(db_board_id=board_id, db_order__gte=state.high_water)
+            if state.bits:
+                board_unread &= ~Q(db_order__in=[state.high_water + bit for bit in readstate.orders_of(state.bits)])
+            found |= board_unread
+        return BBSPost.objects.filter(found)
+    seen = BBSPostRead.objects.filter(account=account, post=OuterRef('pk'),
+                                      date_read__gte=OuterRef('db_date_modified'))
+    return BBSPost.objects.filter(db_board__in=boards).annotate(seen=Exists(seen)).filter(seen=False)
+
+
+def count_unread(account, boards):
+    """
+    Counts unread posts from scratch, in one grouped query.
+
+    Returns:
+        counts (dict): board id -> unread posts. Boards with none are left out.
+    """
+    return dict(unread_queryset(account, boards).order_by().values_list('db_board').annotate(total=Count('id')))
+
+
+def unread_counts(account, boards):
+    """
+    Unread posts per board for one account. Counters that don't exist yet are computed together and saved.
+
+    Args:
+        account (AccountDB): Whose counts.
+        boards (list): Boards to count.
+
+    Returns:
+        counts (dict): board id -> unread posts, for every board given.
+    """
+    if bitmap_store():
+        return readstate.unread_counts(account, _board_ids(boards))
+    board_ids = {board.id for board in boards}
+    counts = dict(BBSUnreadCount.objects.filter(account=account, board_id__in=board_ids)
+                  .values_list('board_id', 'unread'))
+    if (missing := board_ids - counts.keys()):
+        found = count_unread(account, missing)
+        BBSUnreadCount.objects.bulk_create([BBSUnreadCount(account=account, board_id=board_id,
+                                                           unread=found.get(board_id, 0))
+                                            for board_id in missing], ignore_conflicts=True)
+        for board_id in missing:
+            counts[board_id] = found.get(board_id, 0)
+    return counts
+
+
+def at_post_create(post):
+    """
+    A new post is unread for everyone already tracking its board.
+    """
+    if bitmap_store():
+        return
+    BBSUnreadCount.objects.filter(board_id=post.db_board_id).update(unread=F('unread') + 1)
+
+
+def at_post_edit(post, previous_modified):
+    """
+    An edited post becomes unread again for whoever had read it since its previous modification.
+
+    Args:
+        post (BBSPost): The post, already edited.
+        previous_modified (datetime): Its db_date_modified before the edit.
+    """
+    if bitmap_store():
+        return readstate.at_post_edit(post)
+    readers = BBSPostRead.objects.filter(post=post, date_read__gte=previous_modified).values('account')
+    BBSUnreadCount.objects.filter(board_id=post.db_board_id, account__in=readers).update(unread=F('unread') + 1)
+
+
+def at_posts_read(account, board, count):
+    """
+    The account has just read count posts on board that were unread to them.
+    """
+    if count and not bitmap_store():
+        BBSUnreadCount.objects.filter(account=account, board=board).update(
+            unread=Greatest(F('unread') - count, Value(0)))
+
+
+def mark_read(account, posts, batch_size=500):
+    """
+    Marks posts read a batch at a time, instead of a get_or_create and save per post. Each batch is one
+    SELECT of the reads that already exist, one UPDATE for those and one bulk INSERT for the rest, which works
+    on every database and Django version EvMUSH supports.
+
+    Args:
+        account (AccountDB): The reader.
+        posts (iterable of BBSPost): What they've read. May span boards.
+        batch_size (int): Posts per batch.
+
+    Returns:
+        newly_read (int): How many of the posts were unread before.
+    """
+    if not (posts := list(posts)):
+        return 0
+    if bitmap_store():
+        return readstate.mark_read(account, posts)
+    now = utcnow()
+    newly_read = Counter()
+    for start in range(0, len(posts), batch_size):
+        batch = posts[start:start + batch_size]
+        existing = dict(BBSPostRead.objects.filter(account=account, post__in=batch)
+                        .values_list('post_id', 'date_read'))
+        for post in batch:
+            if (date_read := existing.get(post.id, None)) is None or date_read < post.db_date_modified:
+                newly_read[post.db_board_id] += 1
+        if existing:
+            BBSPostRead.objects.filter(account=account, post_id__in=list(existing)).update(date_read=now)
+        BBSPostRead.objects.bulk_create([BBSPostRead(account=account, post=post, date_read=now)
+                                         for post in batch if post.id not in existing], ignore_conflicts=True)
+    for board_id, count in newly_read.items():
+        at_posts_read(account, board_id, count)
+    return sum(newly_read.values())
+
+
+def mark_boards_read(account, boards):
+    """
+    Marks every post on the given boards read in two statements, whatever the number of posts: an UPDATE of
+    the reads that exist, then an INSERT ... SELECT ... WHERE NOT EXISTS for the rest. Both are plain SQL that
+    every database supports.
+
+    Returns:
+        skipped (dict): board id -> how many posts were unread there.
+    """
+    if not (board_ids := _board_ids(boards)):
+        return dict()
+    if bitmap_store():
+        return readstate.mark_boards_read(account, board_ids)
+    skipped = count_unread(account, board_ids)
+    if not skipped:
+        return skipped
+    now = utcnow()
+    quote = connection.ops.quote_name
+    read_table, post_table = quote(BBSPostRead._meta.db_table), quote(BBSPost._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(board_ids))
+    with transaction.atomic():
+        BBSPostRead.objects.filter(account=account, post__db_board_id__in=board_ids).update(date_read=now)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {read_table} (account_id, post_id, date_read) "
+                           f"SELECT %s, p.id, %s FROM {post_table} p WHERE p.db_board_id IN ({placeholders}) "
+                           f"AND NOT EXISTS (SELECT 1 FROM {read_table} r "
+                           f"WHERE r.account_id = %s AND r.post_id = p.id)",
+                           [account.id, connection.ops.adapt_datetimefield_value(now), *board_ids, account.id])
+    BBSUnreadCount.objects.filter(account=account, board_id__in=board_ids).update(unread=0)
+    return skipped
@@ -18,17 +18,20 @@ The commands available to the user when the connection screen is shown
 are defined in evennia.default_cmds.UnloggedinCmdSet. The parsing and display
 of the screen is done by the unlogged-in "look" command.
 
+EvMUSH pre-renders the screen below through the ConnectionScreenService, once
+per width in settings.CONNECTION_SCREEN_WIDTHS and per color capability, so a
+burst of new connections costs no styling work.
+
 """
 
 from django.conf import settings
 from evennia import utils
-from athanor.utils.styling import Styler
-
-_STYLER = Styler(None)
+from evennia.utils.ansi import parse_ansi
+from evmush.utils.styling import Styler
 
-CONNECTION_SCREEN = f"""
-{_STYLER.styled_header("Welcome!")}
- Welcome to |g{settings.SERVERNAME}|n, version {utils.get_evennia_version("short")}!
+CONNECTION_SCREEN_TEMPLATE = """
+{header}
+ Welcome to |g{servername}|n, version {version}!
 
  You may login by typin (without the <>'s):
       |wconnect <username>=<password>|n
@@ -40,4 +43,97 @@ CONNECTION_SCREEN = f"""
         shown to players.
 
  Enter |whelp|n for more info. |wlook|n will re-show this screen.
-{_STYLER.blank_footer}"""
+{footer}"""
+
+
+class ConnectionScreenService:
+    """
+    Keeps the connection screen pre-rendered for the common client widths and color capabilities.
+
+    Each rendering is keyed on (width, color mode). Color modes other than 'markup' are already run
+    through Evennia's ANSI parser and can be sent raw to telnet-style sessions. Everything is thrown
+    away and regenerated only if SERVERNAME or the template changes.
+    """
+    color_modes = ('markup', 'xterm256', 'ansi', 'none')
+    raw_protocols = ('telnet', 'ssl', 'ssh')
+
+    def __init__(self, template=CONNECTION_SCREEN_TEMPLATE):
+        self.template = template
+        self.version = None
+        self.widths = tuple()
+        self.screens = dict()
+
+    def current_version(self):
+        return (settings.SERVERNAME, self.template)
+
+    def load(self):
+        """
+        (Re)builds every pre-rendered screen.
+        """
+        self.version = self.current_version()
+        # An empty setting falls back to the default width rather than leaving fit_width nothing to pick from.
+        widths = getattr(settings, 'CONNECTION_SCREEN_WIDTHS', None) or (settings.CLIENT_DEFAULT_WIDTH,)
+        self.widths = tuple(sorted(set(widths)))
+        self.screens = dict()
+        styler = Styler(None)
+        evennia_version = utils.get_evennia_version("short")
+        for width in self.widths:
+            markup = self.template.format(header=styler.styled_header("Welcome!", width=width),
+                                          footer=styler.styled_footer(width=width),
+                                          servername=settings.SERVERNAME, version=evennia_version)
+            self.screens[(width, 'markup')] = markup
+            self.screens[(width, 'xterm256')] = parse_ansi(markup, xterm256=True)
+            self.screens[(width, 'ansi')] = parse_ansi(markup)
+            self.screens[(width, 'none')] = parse_ansi(markup, strip_ansi=True)
+
+    def fit_width(self, width=None):
+        """
+        Picks the widest pre-rendered width that fits into the client's width.
+        """
+        if not width:
+            width = settings.CLIENT_DEFAULT_WIDTH
+        fitting = [w for w in self.widths if w <= width]
+        return fitting[-1] if fitting else self.widths[0]
+
+    def color_mode(self, session):
+        if session.protocol_key not in self.raw_protocols:
+            return 'markup'
+        flags = session.protocol_flags
+        if flags.get('NOCOLOR', False) or not flags.get('ANSI', True):
+            return 'none'
+        return 'xterm256' if flags.get('XTERM256', False) else 'ansi'
+
+    def render(self, width=None, color_mode='markup'):
+        if self.version != self.current_version():
+            self.load()
+        return self.screens[(self.fit_width(width), color_mode)]
+
+    def send(self, session):
+        """
+        Sends the right pre-rendered screen to a newly connected session.
+
+        Screen readers and NOCOLOR sessions get the plain rendering without the raw flag, so that Evennia's own
+        SCREENREADER and NOCOLOR handling still runs on it and strips the box-drawing art.
+        """
+        flags = session.protocol_flags
+        width = flags.get('SCREENWIDTH', {0: None})[0]
+        if flags.get('SCREENREADER', False) or flags.get('NOCOLOR', False):
+            session.msg(text=self.render(width, 'none'))
+            return
+        color_mode = self.color_mode(session)
+        screen = self.render(width, color_mode)
+        if color_mode == 'markup':
+            session.msg(text=screen)
+        else:
+            session.msg(text=(screen, {'raw': True}))
+
+
+SCREENS = ConnectionScreenService()
+
+
+def connection_screen():
+    """
+    Fallback for Evennia's stock unlogged-in look command, which has no session to size the screen for.
+    EvMUSH's LoginCmdSet replaces that command with one that calls SCREENS.send(session).
+    """
+    return SCREENS.render()
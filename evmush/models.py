@@ -219,3 +219,31 @@ class BBSPostRead(models.Model):
 
     class Meta:
         unique_together = (('account', 'post'),)
+
+
+class BBSUnreadCount(models.Model):
+    """
+    How many posts on a board an account has not read (or that changed since they read them). Maintained by
+    evmush.bbs.unread so board listings don't count posts. Rows are created the first time they're needed.
+    """
+    account = models.ForeignKey('accounts.AccountDB', related_name='bbs_unread', on_delete=models.CASCADE)
+    board = models.ForeignKey(BoardDB, related_name='+', on_delete=models.CASCADE)
+    unread = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('account', 'board'),)
+
+
+class BBSReadState(models.Model):
+    """
+    Compact alternative to BBSPostRead: one row per (account, board) instead of one per (account, post).
+    Every post numbered below high_water has been read. exceptions is a zlib-compressed bitmap of posts read
+    from there on, where bit 0 is post high_water. See evmush.bbs.readstate.
+    """
+    account = models.ForeignKey('accounts.AccountDB', related_name='bbs_read_states', on_delete=models.CASCADE)
+    board = models.ForeignKey(BoardDB, related_name='+', on_delete=models.CASCADE)
+    high_water = models.PositiveIntegerField(default=0)
+    exceptions = models.BinaryField(default=b'')
+
+    class Meta:
+        unique_together = (('account', 'board'),)
@@ -0,0 +1,13 @@
+from evennia.commands.default.cmdset_unloggedin import UnloggedinCmdSet
+
+from evmush.serversessions import commands as sescmds
+
+
+class LoginCmdSet(UnloggedinCmdSet):
+    key = "DefaultUnloggedin"
+
+    def at_cmdset_creation(self):
+        super().at_cmdset_creation()
+        self.add(sescmds.CmdUnconnectedLook)
+        self.add(sescmds.CmdUnconnectedConnect)
+        self.add(sescmds.CmdUnconnectedCreate)
@@ -0,0 +1,93 @@
+from evennia.commands.default.unloggedin import CmdUnconnectedLook as _CmdUnconnectedLook
+from evennia.commands.default.unloggedin import CmdUnconnectedConnect as _CmdUnconnectedConnect
+from evennia.commands.default.unloggedin import CmdUnconnectedCreate as _CmdUnconnectedCreate
+
+import athanor
+from evmush.connection_screens import SCREENS
+
+
+class _AccountCommandMixin:
+    """
+    Runs a login-screen operation through the Account controller. Failures, immediate or from the returned
+    Deferred, are shown to the session.
+    """
+
+    def run(self, operation, *args, callback=None, **kwargs):
+        session = self.caller
+        controller = athanor.api()['controller_manager'].get('account')
+        try:
+            deferred = getattr(controller, operation)(session, *args, **kwargs)
+        except ValueError as err:
+            session.msg(str(err))
+            return
+        deferred.addCallbacks(callback or (lambda result: result), self.report_failure)
+
+    def report_failure(self, failure):
+        failure.trap(ValueError)
+        self.caller.msg(str(failure.value))
+
+
+class CmdUnconnectedLook(_CmdUnconnectedLook):
+    """
+    look when in unlogged-in state
+
+    Usage:
+      look
+
+    This is called by the server and kicks everything in gear.
+    All it does is display the connect screen, pre-rendered to fit
+    the client's width and color support.
+    """
+
+    def func(self):
+        SCREENS.send(self.caller)
+
+
+class CmdUnconnectedConnect(_AccountCommandMixin, _CmdUnconnectedConnect):
+    """
+    connect to the game
+
+    Usage (at login screen):
+      connect <username>=<password>
+      connect <username> <password>
+
+    Use the create command to first create an account before logging in.
+    Attempts are throttled per address, and the password is checked
+    off the main server thread.
+    """
+
+    def func(self):
+        args = self.args.strip()
+        if '=' in args:
+            username, password = args.split('=', 1)
+        elif len(parts := args.split(None, 1)) == 2:
+            username, password = parts
+        else:
+            self.caller.msg("Usage: connect <username>=<password>")
+            return
+        self.run('login_account', username.strip(), password.strip())
+
+
+class CmdUnconnectedCreate(_AccountCommandMixin, _CmdUnconnectedCreate):
+    """
+    create a new account
+
+    Usage (at login screen):
+      create <username>,<email>,<password>
+
+    This creates a new account. Account creation is throttled per
+    address.
+    """
+
+    def func(self):
+        if len(args := [arg.strip() for arg in self.args.split(',', 2)]) != 3:
+            self.caller.msg("Usage: create <username>,<email>,<password>")
+            return
+        username, email, password = args
+
+        def created(account):
+            self.caller.msg(f"A new account '{account.username}' was created. Welcome!\n"
+                            f"You can now log in with: |wconnect {account.username}=<password>|n")
+            return account
+
+        self.run('create_account', username, email, password, login_screen=True, callback=created)
@@ -9,6 +9,7 @@ creation commands.
 """
 from evennia import DefaultCharacter
 from evmush.typeclasses.mushbase import MushObject
+from evmush.utils.online import ONLINE
 
 
 class Character(DefaultCharacter, MushObject):
@@ -34,6 +35,14 @@ class Character(DefaultCharacter, MushObject):
     meta_type = 'MOBILE'
     meta_letter = 'M'
 
+    def at_post_puppet(self, **kwargs):
+        super().at_post_puppet(**kwargs)
+        ONLINE.link_puppet(self)
+
+    def at_post_unpuppet(self, account, session=None, **kwargs):
+        super().at_post_unpuppet(account, session=session, **kwargs)
+        ONLINE.unlink_puppet(self)
+
 
 class PlayerCharacter(Character):
     meta_type = 'PLAYER'
@@ -0,0 +1,70 @@
+"""
+Fans system alerts out to online admins.
+"""
+import time
+from collections import defaultdict, deque
+
+from twisted.internet import reactor
+
+from evmush.utils.online import admin_accounts
+
+
+def format_system_msg(text, system_name, border_color, text_color):
+    return f"|{border_color}-=<|n|{text_color}{system_name.upper()}|n|{border_color}>=-|n {text}"
+
+
+class AlertBus:
+    """
+    Sends controller alerts to every online admin. Each message is formatted once per distinct
+    (sys_msg_border, sys_msg_text) option profile rather than once per admin.
+
+    Each system may send `burst` alerts per `window` seconds. Anything beyond that is held, and sent as a
+    single digest when the window ends, so a mass operation can't flood admin sessions.
+    """
+    digest_lines = 10
+
+    def __init__(self, burst=5, window=5.0):
+        self.burst = burst
+        self.window = window
+        self.recent = defaultdict(deque)
+        self.pending = defaultdict(list)
+        self.timers = dict()
+
+    def alert(self, message, system_name, enactor=None):
+        if self.pending.get(system_name, None):
+            self.pending[system_name].append(message)
+            return
+        now = time.monotonic()
+        recent = self.recent[system_name]
+        while recent and recent[0] <= now - self.window:
+            recent.popleft()
+        if len(recent) < self.burst:
+            recent.append(now)
+            self.send(message, system_name)
+            return
+        self.pending[system_name].append(message)
+        self.timers[system_name] = reactor.callLater(max(recent[0] + self.window - now, 0), self.flush,
+                                                     system_name)
+
+    def flush(self, system_name):
+        self.timers.pop(system_name, None)
+        if not (messages := self.pending.pop(system_name, None)):
+            return
+        self.recent[system_name].append(time.monotonic())
+        if len(messages) == 1:
+            self.send(messages[0], system_name)
+            return
+        lines = [f"{len(messages)} alerts in the last {self.window:g} seconds:"]
+        lines.extend(str(msg) for msg in messages[:self.digest_lines])
+        if len(messages) > self.digest_lines:
+            lines.append(f"...and {len(messages) - self.digest_lines} more.")
+        self.send('\n'.join(lines), system_name)
+
+    def send(self, message, system_name):
+        formatted = dict()
+        for acc in admin_accounts():
+            options = acc.options
+            profile = (options.sys_msg_border, options.sys_msg_text)
+            if (text := formatted.get(profile, None)) is None:
+                text = formatted[profile] = format_system_msg(message, system_name, *profile)
+            acc.msg(text=text, system_name=system_name, original_text=message)
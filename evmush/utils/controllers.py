@@ -1,8 +1,13 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from django.conf import settings
+from django.db import connections
 
-from evennia.utils.logger import log_trace
+from evennia.utils.logger import log_trace, log_info
 from evennia.utils.utils import class_from_module
-from evmush.utils.online import admin_accounts
+from evmush.utils.alerts import AlertBus
+from evmush.utils.instrument import ControllerInstrumentation
 
 
 class ControllerManager:
@@ -10,33 +15,135 @@ class ControllerManager:
     def __init__(self, api):
         self.api = api
         self.controllers = dict()
+        self.alerts = AlertBus(*settings.CONTROLLER_ALERT_RATE)
+        # controller key -> seconds spent warming up and loading it.
+        self.load_times = dict()
 
     def load(self):
+        """
+        Instantiates every controller in settings.CONTROLLERS, then loads the eager ones in dependency order.
+        Controllers whose dependencies are all loaded form one level. A level's cache warm-ups run
+        concurrently on up to settings.CONTROLLER_LOAD_THREADS threads before each is loaded in turn.
+        """
         for controller_key, controller_def in settings.CONTROLLERS.items():
             con_class = class_from_module(controller_def.get("class", settings.BASE_CONTROLLER_CLASS))
             backend = class_from_module(controller_def.get('backend'))
-            self.controllers[controller_key] = con_class(controller_key, self, backend)
+            controller = con_class(controller_key, self, backend)
+            controller.dependencies = tuple(controller_def.get('dependencies', controller.dependencies))
+            controller.lazy = controller_def.get('lazy', controller.lazy)
+            if getattr(settings, 'CONTROLLER_INSTRUMENTATION', False):
+                controller.instrumentation = ControllerInstrumentation(controller)
+                controller.instrumentation.install()
+            self.controllers[controller_key] = controller
+
+        start = time.perf_counter()
+        for level in self.load_order():
+            if not (eager := [self.controllers[key] for key in level if not self.controllers[key].lazy]):
+                continue
+            self.warm_up(eager)
+            for controller in eager:
+                try:
+                    self.load_controller(controller)
+                except Exception:
+                    log_trace()
+        log_info(f"Controllers loaded in {time.perf_counter() - start:.3f}s: " +
+                 ', '.join(f"{key} {secs:.3f}s" for key, secs in self.load_times.items()))
+
+    def load_order(self):
+        """
+        Sorts controllers topologically by their dependencies.
+
+        Returns:
+            levels (list of lists): Controller keys. Each level depends only on earlier levels.
+        """
+        remaining = dict()
+        for key, controller in self.controllers.items():
+            if (missing := [dep for dep in controller.dependencies if dep not in self.controllers]):
+                raise ValueError(f"Controller '{key}' depends on unknown controller(s): {', '.join(missing)}")
+            remaining[key] = set(controller.dependencies)
+        levels = list()
+        while remaining:
+            if not (level := sorted(key for key, deps in remaining.items() if not deps)):
+                raise ValueError(f"Controller dependency cycle among: {', '.join(sorted(remaining))}")
+            levels.append(level)
+            for key in level:
+                del remaining[key]
+            for deps in remaining.values():
+                deps.difference_update(level)
+        return levels
+
+    def warm_up(self, controllers):
+        threads = getattr(settings, 'CONTROLLER_LOAD_THREADS', 1)
+        if threads <= 1 or len(controllers) < 2:
+            for controller in controllers:
+                self._timed_warm_up(controller)
+            return
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='evmush-controllers') as pool:
+            for future in [pool.submit(self._timed_warm_up, controller, True) for controller in controllers]:
+                future.result()
+
+    def _timed_warm_up(self, controller, threaded=False):
+        start = time.perf_counter()
+        try:
+            controller.warm_up()
+        except Exception:
+            log_trace()
+        finally:
+            if threaded:
+                # Each worker thread gets its own database connection. Don't leak them.
+                connections.close_all()
+        self.load_times[controller.key] = time.perf_counter() - start
+
+    def load_controller(self, controller):
+        if controller.loaded:
+            return
+        for dep in controller.dependencies:
+            self.load_controller(self.controllers[dep])
+        start = time.perf_counter()
+        controller.load()
+        self.load_times[controller.key] = self.load_times.get(controller.key, 0) + time.perf_counter() - start
+
+    def dump_stats(self):
+        """
+        Returns:
+            stats (dict): controller key -> method name -> stats, for instrumented controllers. Also includes
+                'load_times'.
+        """
+        stats = {'load_times': dict(self.load_times)}
+        for key, controller in self.controllers.items():
+            if controller.instrumentation:
+                stats[key] = controller.instrumentation.dump()
+        return stats
+
+    def reset_stats(self):
+        for controller in self.controllers.values():
+            if controller.instrumentation:
+                controller.instrumentation.reset()
 
     def get(self, con_key):
         if not (found := self.controllers.get(con_key, None)):
             raise ValueError("Controller not found!")
         if not found.loaded:
-            found.load()
+            self.load_controller(found)
         return found
 
 
 class EvMUSHController:
     system_name = None
+    # Keys of controllers that must be loaded before this one. settings.CONTROLLERS entries may override.
+    dependencies = tuple()
+    # Lazy controllers are only loaded the first time something asks the manager for them.
+    lazy = False
 
     def __init__(self, key, manager, backend):
         self.key = key
         self.manager = manager
         self.loaded = False
+        self.instrumentation = None
         self.backend = backend(self)
 
     def alert(self, message, enactor=None):
-        for acc in admin_accounts():
-            acc.system_msg(message, system_name=self.system_name, enactor=enactor)
+        self.manager.alerts.alert(message, self.system_name, enactor=enactor)
 
     def msg_target(self, message, target):
         target.msg(message, system_alert=self.system_name)
@@ -50,9 +157,16 @@ class EvMUSHController:
         """
         if self.loaded:
             return
+        self.backend.load()
         self.do_load()
         self.loaded = True
 
+    def warm_up(self):
+        """
+        Called before load(), possibly on a worker thread alongside other controllers. Passes on to the backend.
+        """
+        self.backend.warm_up()
+
     def do_load(self):
         """
         Implements the actual logic of loading. Meant to be overloaded.
@@ -69,8 +183,7 @@ class EvMUSHControllerBackend:
         self.loaded = False
 
     def alert(self, message, enactor=None):
-        for acc in admin_accounts():
-            acc.system_msg(message, system_name=self.system_name, enactor=enactor)
+        self.frontend.manager.alerts.alert(message, self.system_name, enactor=enactor)
 
     def msg_target(self, message, target):
         target.msg(message, system_alert=self.system_name)
@@ -97,6 +210,13 @@ class EvMUSHControllerBackend:
         self.do_load()
         self.loaded = True
 
+    def warm_up(self):
+        """
+        Pre-fetches whatever do_load will need. This may run on a worker thread, so it must only read from
+        the database and store results on self. It must not send messages or touch anything else shared.
+        """
+        pass
+
     def do_load(self):
         """
         Implements the actual logic of loading. Meant to be overloaded.
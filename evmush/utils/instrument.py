@@ -0,0 +1,104 @@
+"""
+Opt-in instrumentation for controller methods: call counts, latency histograms, Django query counts and
+error rates. Enable with settings.CONTROLLER_INSTRUMENTATION.
+"""
+import time
+from functools import wraps
+
+from django.db import connection
+
+# Upper bounds, in milliseconds, of the latency histogram buckets. The last bucket catches everything else.
+LATENCY_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class MethodStats:
+    __slots__ = ('calls', 'errors', 'total_time', 'max_time', 'queries', 'histogram')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.queries = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, elapsed, queries, failed):
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.queries += queries
+        if failed:
+            self.errors += 1
+        msecs = elapsed * 1000
+        for num, bound in enumerate(LATENCY_BUCKETS):
+            if msecs <= bound:
+                self.histogram[num] += 1
+                return
+        self.histogram[-1] += 1
+
+    def dump(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'error_rate': self.errors / self.calls if self.calls else 0.0,
+            'avg_ms': self.total_time * 1000 / self.calls if self.calls else 0.0,
+            'max_ms': self.max_time * 1000,
+            'queries': self.queries,
+            'avg_queries': self.queries / self.calls if self.calls else 0.0,
+            'histogram': dict(zip([f"<={b}ms" for b in LATENCY_BUCKETS] + ['slower'], self.histogram))
+        }
+
+
+class ControllerInstrumentation:
+    """
+    Wraps every public method of a controller instance. Methods returning Deferreds are timed only up to
+    the point they return.
+    """
+    exclude = ('load', 'do_load', 'warm_up', 'alert', 'msg_target')
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.stats = dict()
+
+    def install(self):
+        for name in dir(type(self.controller)):
+            if name.startswith('_') or name in self.exclude:
+                continue
+            if name in self.stats:
+                continue
+            if not callable(method := getattr(self.controller, name, None)) or isinstance(method, type):
+                continue
+            setattr(self.controller, name, self.wrap(name, method))
+
+    def wrap(self, name, method):
+        stats = self.stats.setdefault(name, MethodStats())
+
+        @wraps(method)
+        def instrumented(*args, **kwargs):
+            queries = [0]
+
+            def count_query(execute, sql, params, many, context):
+                queries[0] += 1
+                return execute(sql, params, many, context)
+
+            failed = True
+            start = time.perf_counter()
+            try:
+                with connection.execute_wrapper(count_query):
+                    result = method(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                stats.record(time.perf_counter() - start, queries[0], failed)
+
+        return instrumented
+
+    def reset(self):
+        for stats in self.stats.values():
+            stats.clear()
+
+    def dump(self):
+        return {name: stats.dump() for name, stats in self.stats.items() if stats.calls}
@@ -1,6 +1,173 @@
+import bisect
+
+from django.db.models.signals import post_save
+
 import evennia
 
 
+class SortedPresence:
+    """
+    A refcounted set of online entities, kept sorted by key so listing them never needs a sort.
+    Each entity is counted once per session it is linked through.
+    """
+
+    def __init__(self):
+        self.order = list()
+        # id -> [sort key, entity, count]
+        self.entries = dict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, obj):
+        return obj.id in self.entries
+
+    def add(self, obj):
+        """
+        Returns:
+            first (bool): True if obj was not already online.
+        """
+        if (entry := self.entries.get(obj.id, None)):
+            entry[2] += 1
+            return False
+        sort_key = (obj.key, obj.id)
+        self.entries[obj.id] = [sort_key, obj, 1]
+        bisect.insort(self.order, sort_key)
+        return True
+
+    def remove(self, obj, everything=False):
+        """
+        Returns:
+            last (bool): True if obj is no longer online at all.
+        """
+        if not (entry := self.entries.get(obj.id, None)):
+            return False
+        entry[2] -= 1
+        if entry[2] > 0 and not everything:
+            return False
+        del self.entries[obj.id]
+        index = bisect.bisect_left(self.order, entry[0])
+        if index < len(self.order) and self.order[index] == entry[0]:
+            del self.order[index]
+        return True
+
+    def rekey(self, obj):
+        """
+        Moves obj to its new place after a rename.
+        """
+        if not (entry := self.entries.get(obj.id, None)):
+            return
+        count = entry[2]
+        self.remove(obj, everything=True)
+        self.add(obj)
+        self.entries[obj.id][2] = count
+
+    def values(self):
+        entries = self.entries
+        return [entries[obj_id][1] for key, obj_id in self.order]
+
+
+class OnlineRegistry:
+    """
+    Who is online, maintained by the Account session hooks and the Character puppet hooks instead of being
+    derived by walking every session. Admins are worked out once when they come online, and again by
+    refresh_admin() when their permissions change.
+    """
+    admin_lock = 'dummy:perm(Admin)'
+
+    def __init__(self):
+        self.loaded = False
+        self.accounts = SortedPresence()
+        self.puppets = SortedPresence()
+        self.admin_accounts = set()
+        self.admin_puppets = set()
+
+    def rebuild(self):
+        """
+        Builds everything from the session handler. Only needed when the registry has been lost, such as
+        after a reload with sessions still connected.
+        """
+        self.accounts = SortedPresence()
+        self.puppets = SortedPresence()
+        self.admin_accounts = set()
+        self.admin_puppets = set()
+        for session in evennia.SESSION_HANDLER.values():
+            if (account := session.get_account()):
+                self._add(self.accounts, self.admin_accounts, account)
+            if (puppet := session.get_puppet()):
+                self._add(self.puppets, self.admin_puppets, puppet)
+        # Anything can rename an online Account or Character (@name, rename commands, scripts), so watch
+        # saves rather than relying on every caller to rekey.
+        post_save.connect(self.at_saved, dispatch_uid='evmush_online_rekey')
+        self.loaded = True
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.rebuild()
+
+    def is_admin(self, obj):
+        return obj.locks.check_lockstring(obj, self.admin_lock)
+
+    def _add(self, presence, admins, obj):
+        if presence.add(obj) and self.is_admin(obj):
+            admins.add(obj)
+
+    def _remove(self, presence, admins, obj):
+        if presence.remove(obj):
+            admins.discard(obj)
+
+    def link_account(self, account):
+        if self.loaded:
+            self._add(self.accounts, self.admin_accounts, account)
+
+    def unlink_account(self, account):
+        if self.loaded:
+            self._remove(self.accounts, self.admin_accounts, account)
+
+    def link_puppet(self, puppet):
+        if self.loaded:
+            self._add(self.puppets, self.admin_puppets, puppet)
+
+    def unlink_puppet(self, puppet):
+        if self.loaded:
+            self._remove(self.puppets, self.admin_puppets, puppet)
+
+    def refresh_admin(self, obj):
+        """
+        Re-checks whether an online entity counts as admin, for use after its permissions change. A puppet's
+        perm() checks go through its Account, so an Account's puppets are re-checked with it.
+        """
+        for presence, admins in ((self.accounts, self.admin_accounts), (self.puppets, self.admin_puppets)):
+            if obj in presence and presence.entries[obj.id][1] is obj:
+                if self.is_admin(obj):
+                    admins.add(obj)
+                else:
+                    admins.discard(obj)
+        if obj in self.accounts and hasattr(obj, 'get_all_puppets'):
+            for puppet in obj.get_all_puppets():
+                self.refresh_admin(puppet)
+
+    def at_saved(self, sender, instance, **kwargs):
+        """
+        post_save receiver that keeps the sorted presences in order after a rename. Runs for every save, so
+        it only does dict lookups unless an online entity's key really changed.
+        """
+        if (update_fields := kwargs.get('update_fields', None)) and 'db_key' not in update_fields \
+                and 'username' not in update_fields:
+            return
+        for presence in (self.accounts, self.puppets):
+            if (entry := presence.entries.get(getattr(instance, 'id', None), None)) and entry[1] is instance \
+                    and entry[0][0] != instance.key:
+                presence.rekey(instance)
+
+    def rekey(self, obj):
+        self.accounts.rekey(obj)
+        self.puppets.rekey(obj)
+
+
+ONLINE = OnlineRegistry()
+
+
 def sessions():
     """
     Simple shortcut to retrieving all connected sessions.
@@ -13,23 +180,24 @@ def sessions():
 
 def accounts():
     """
-    Uses the current online sessions to derive a list of connected players.
+    The connected players, sorted by key.
 
     Returns:
         list
     """
-    return sorted([acc for acc in evennia.SESSION_HANDLER.all_connected_accounts()], key=lambda acc: acc.key)
+    ONLINE.ensure_loaded()
+    return ONLINE.accounts.values()
 
 
 def puppets():
     """
-    Uses the current online sessions to derive a list of connected characters.
+    The connected characters, sorted by key.
 
     Returns:
         list
     """
-    characters = {puppet for session in sessions() if (puppet := session.get_puppet())}
-    return sorted(list(characters), key=lambda char: char.key)
+    ONLINE.ensure_loaded()
+    return ONLINE.puppets.values()
 
 
 def admin_chars():
@@ -39,7 +207,8 @@ def admin_chars():
 
     :return: list
     """
-    return set([char for char in puppets() if char.locks.check_lockstring(char, 'dummy:perm(Admin)')])
+    ONLINE.ensure_loaded()
+    return set(ONLINE.admin_puppets)
 
 
 def admin_accounts():
@@ -49,4 +218,5 @@ def admin_accounts():
 
     :return: list
     """
-    return set([acc for acc in accounts() if acc.locks.check_lockstring(acc, 'dummy:perm(Admin)')])
+    ONLINE.ensure_loaded()
+    return set(ONLINE.admin_accounts)
@@ -0,0 +1,62 @@
+"""
+Password hashing and verification, run on a bounded thread pool so that a slow hasher (PBKDF2, argon2, ...)
+never blocks the reactor thread.
+
+Only the pure hashing work happens in the pool. Anything touching the database is left to the callbacks,
+which run back on the reactor thread.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, check_password
+
+from twisted.internet import reactor
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+_POOL = None
+
+
+class EncodedPassword(str):
+    """
+    A password hash_password() has already encoded. AthanorAccount stores it as it is rather than hashing it
+    again, so it can be handed to the normal Account creation path.
+    """
+
+
+def password_pool():
+    """
+    Starts the pool on first use, sized by settings.PASSWORD_HASH_THREADS.
+
+    Returns:
+        ThreadPool
+    """
+    global _POOL
+    if _POOL is None:
+        _POOL = ThreadPool(minthreads=1, maxthreads=getattr(settings, 'PASSWORD_HASH_THREADS', 4),
+                           name='evmush-passwords')
+        _POOL.start()
+        reactor.addSystemEventTrigger('before', 'shutdown', _POOL.stop)
+    return _POOL
+
+
+def hash_password(raw_password):
+    """
+    Returns:
+        Deferred: Fires with the encoded password, ready to store in Account.password.
+    """
+    return deferToThreadPool(reactor, password_pool(), make_password, raw_password)
+
+
+def verify_password(account, raw_password):
+    """
+    Returns:
+        Deferred: Fires with True if raw_password is the Account's password.
+    """
+    return deferToThreadPool(reactor, password_pool(), check_password, raw_password, account.password)
+
+
+def store_password(account, encoded_password):
+    """
+    Saves an already-hashed password on an Account. Call from the reactor thread.
+    """
+    account.password = encoded_password
+    account.save(update_fields=['password'])
@@ -0,0 +1,115 @@
+"""
+Debugging aid that records every SQL statement a command runs and flags likely N+1 patterns: the same
+statement, differing only in its parameters, repeated many times in one command. Enable with
+settings.QUERY_WATCH.
+"""
+import re
+import time
+import traceback
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from evennia.utils.logger import log_warn
+
+_FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE), 'IN (...)'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql):
+    """
+    Normalizes a SQL statement so that queries differing only in literals or parameters compare equal.
+
+    Args:
+        sql (str): The SQL as given to the database cursor.
+
+    Returns:
+        fingerprint (str)
+    """
+    for regex, replacement in _FINGERPRINT_RULES:
+        sql = regex.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryWatch:
+    """
+    Captures the queries run on this thread's database connection while active.
+
+    Args:
+        label (str): What's being watched, for the log.
+        threshold (int): A fingerprint repeated more than this many times is flagged as a likely N+1.
+        slow_ms (float): Queries slower than this are reported individually.
+    """
+
+    def __init__(self, label, threshold=10, slow_ms=100.0):
+        self.label = label
+        self.threshold = threshold
+        self.slow_ms = slow_ms
+        self.queries = list()
+        self.counts = defaultdict(int)
+        # fingerprint -> formatted stack from when it crossed the threshold.
+        self.stacks = dict()
+        self.slow = list()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            found = fingerprint(sql)
+            self.queries.append((found, elapsed))
+            self.counts[found] += 1
+            if self.counts[found] == self.threshold + 1:
+                # Drop the frames belonging to Django's cursor wrapper and this watcher.
+                self.stacks[found] = ''.join(traceback.format_stack()[:-4])
+            if elapsed >= self.slow_ms:
+                self.slow.append((elapsed, sql))
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._wrapper.__exit__(exc_type, exc_val, exc_tb)
+        self.report()
+        return False
+
+    def repeated(self):
+        """
+        Returns:
+            repeated (list): (count, fingerprint) of statements repeated more than threshold times, worst first.
+        """
+        return sorted(((count, found) for found, count in self.counts.items() if count > self.threshold),
+                      reverse=True)
+
+    def report(self):
+        """
+        Logs any likely N+1 patterns and slow queries.
+        """
+        total = sum(elapsed for found, elapsed in self.queries)
+        for count, found in self.repeated():
+            log_warn(f"QueryWatch: {self.label} ran this {count} times ({len(self.queries)} queries, "
+                     f"{total:.1f}ms total). Likely N+1:\n    {found}\nFirst repeated from:\n{self.stacks[found]}")
+        for elapsed, sql in self.slow:
+            log_warn(f"QueryWatch: {self.label} ran a slow query ({elapsed:.1f}ms):\n    {sql}")
+
+
+class QueryWatchMixin:
+    """
+    Command mixin that runs func() under a QueryWatch when settings.QUERY_WATCH is enabled.
+    """
+
+    def func(self):
+        if not getattr(settings, 'QUERY_WATCH', False):
+            return super().func()
+        label = f"{self.key}{'/' + '/'.join(self.switches) if getattr(self, 'switches', None) else ''}"
+        with QueryWatch(label, settings.QUERY_WATCH_REPEAT_THRESHOLD, settings.QUERY_WATCH_SLOW_MS):
+            return super().func()
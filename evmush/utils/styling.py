@@ -1,10 +1,74 @@
-import math, datetime
+import math, datetime, re
 from django.conf import settings
 
 from evennia.utils.evtable import EvTable
 from evennia.utils.ansi import ANSIString
 from evennia.utils.utils import lazy_property, class_from_module
 
+class StyledTable:
+    """
+    A pre-compiled table layout. The column spec is turned into a single format string once, so
+    rendering a row is one str.format() call rather than building an EvTable and an ANSIString for
+    every border character.
+
+    Cell values are treated as plain text. They are padded/truncated to their column width and then
+    wrapped in the column's color, if any.
+    """
+    alignments = {'l': '<', 'r': '>', 'c': '^', '<': '<', '>': '>', '^': '^'}
+
+    def __init__(self, columns, width, header_color=None, separator=' '):
+        """
+        Args:
+            columns (tuple): Each column is a tuple of (name, width[, align[, color]]). A width of
+                None makes that column absorb whatever width remains. align is one of l/r/c.
+            width (int): Total width of the table.
+            header_color (str): Color code used for the column name row.
+            separator (str): Placed between columns.
+        """
+        self.columns = columns
+        self.separator = separator
+        specs = list()
+        for col in columns:
+            name, col_width, align, color = (tuple(col) + (None, None))[:4]
+            specs.append([name, col_width, self.alignments.get(align or 'l', '<'), color])
+
+        fixed = sum(spec[1] for spec in specs if spec[1] is not None)
+        remaining = max(width - fixed - (len(specs) - 1) * len(separator), 1)
+        for spec in specs:
+            if spec[1] is None:
+                spec[1] = remaining
+        self.widths = tuple(spec[1] for spec in specs)
+
+        cells = list()
+        names = list()
+        for num, (name, col_width, align, color) in enumerate(specs):
+            cell = f"{{{num}:{align}{col_width}.{col_width}}}"
+            cells.append(f"|{color}{cell}|n" if color else cell)
+            names.append(f"{str(name):{align}{col_width}.{col_width}}")
+        self.row_format = separator.join(cells)
+        names = separator.join(names)
+        self.header = f"|{header_color}{names}|n" if header_color else names
+
+    def row(self, *values):
+        return self.row_format.format(*[str(val) for val in values])
+
+    def render(self, rows, header=True):
+        """
+        Renders many rows at once.
+
+        Args:
+            rows (iterable): Each row is an iterable of cell values.
+            header (bool): Include the column names as the first line.
+
+        Returns:
+            lines (list)
+        """
+        row_format = self.row_format.format
+        lines = [self.header] if header else list()
+        lines.extend(row_format(*[str(val) for val in row]) for row in rows)
+        return lines
+
+
 class Styler:
     fallback = dict()
     loaded = False
@@ -53,6 +117,7 @@ class Styler:
                 or incomplete and ready for use with `.add_row` or `.add_collumn`.
 
         """
+
         border_color = self.options.get("border_color")
         column_color = self.options.get("column_names_color")
 
@@ -86,6 +151,27 @@ class Styler:
         )
         return table
 
+    def compiled_table(self, *columns, separator=' ', width=None):
+        """
+        Retrieve a StyledTable for the given column spec, compiling it only once per Styler.
+
+        Args:
+            *columns (tuple): Column specs. See StyledTable.
+            separator (str): Placed between columns.
+            width (int): Total width. The Styler's width if not given.
+
+        Returns:
+            table (StyledTable)
+        """
+        cache_id = ('table', columns, separator, width)
+        cache = self.cache if self.viewer else self.fallback_cache
+        if (found := cache.get(cache_id, None)):
+            return found
+        table = StyledTable(columns, width or self.width, header_color=self.options.get('column_names_color'),
+                            separator=separator)
+        cache[cache_id] = table
+        return table
+
     def _render_decoration(
             self,
             header_text=None,
@@ -130,7 +216,7 @@ class Styler:
         colors["headertext"] = self.options.get(f"{mode}_text_color")
         colors["headerstar"] = self.options.get(f"{mode}_star_color")
 
-        width = self.width
+        width = width or self.width
         if edge_character:
             width -= 2
 
@@ -223,9 +309,77 @@ class Styler:
         'standard': '%b %d %I:%M%p %Z',
     }
 
+    # Shared across all Stylers, since localized strings depend only on the timezone, the format, and the instant.
+    time_cache = dict()
+    time_cache_max = 20000
+
+    # strftime directives by conversion letter, allowing the glibc flag and width forms like %-M, %_H or %010d.
+    # Formats with a second-level directive or any letter not listed here are never cached.
+    _directive = re.compile(r'%[-_0^#]*\d*(.)')
+    _second_directives = frozenset('SfcXTsr')
+    _time_directives = frozenset('HIklMpPRZz')
+    _date_directives = frozenset('aAbBhCdDeFgGjmnuUVwWxyYt%')
+
+    @classmethod
+    def time_bucket(cls, time_format):
+        """
+        Determines how many seconds of UTC time will always localize to the same string for this format.
+        Formats with minutes share a minute. Date-only formats share a quarter-hour, since every real-world
+        UTC offset is a multiple of fifteen minutes and so a local date never changes inside one.
+
+        Returns:
+            seconds (int or None): None means the format must not be cached.
+        """
+        bucket = 900
+        for directive in cls._directive.findall(time_format):
+            if directive in cls._time_directives:
+                bucket = 60
+            elif directive not in cls._date_directives:
+                return None
+        return bucket
+
     def localize_timestring(self, time_data=None, time_format='standard', tz=None):
         if not time_data:
             time_data = datetime.datetime.utcnow()
         if not tz:
             tz = self.options.get('timezone')
-        return time_data.astimezone(tz).strftime(time_format)
+        time_format = self.time_formats.get(time_format, time_format)
+        if not (bucket := self.time_bucket(time_format)):
+            return time_data.astimezone(tz).strftime(time_format)
+        cache_id = (tz, time_format, int(time_data.timestamp() // bucket))
+        if (found := self.time_cache.get(cache_id, None)) is not None:
+            return found
+        if len(self.time_cache) >= self.time_cache_max:
+            self.time_cache.clear()
+        found = time_data.astimezone(tz).strftime(time_format)
+        self.time_cache[cache_id] = found
+        return found
+
+    def localize_timestrings(self, times, time_format='standard', tz=None):
+        """
+        Localizes a whole column of datetimes at once, such as every post date on a board.
+
+        Args:
+            times (iterable of datetime): The datetimes to localize.
+            time_format (str): A key of time_formats or a strftime format.
+            tz (tzinfo): The timezone. The viewer's if not given.
+
+        Returns:
+            strings (list): The localized strings, in the same order.
+        """
+        if not tz:
+            tz = self.options.get('timezone')
+        time_format = self.time_formats.get(time_format, time_format)
+        if not (bucket := self.time_bucket(time_format)):
+            return [time_data.astimezone(tz).strftime(time_format) for time_data in times]
+        cache = self.time_cache
+        results = list()
+        for time_data in times:
+            cache_id = (tz, time_format, int(time_data.timestamp() // bucket))
+            if (found := cache.get(cache_id, None)) is None:
+                found = time_data.astimezone(tz).strftime(time_format)
+                cache[cache_id] = found
+            results.append(found)
+        if len(cache) >= self.time_cache_max:
+            cache.clear()
+        return results
@@ -0,0 +1,24 @@
+"""
+Run with `evennia test evmush.utils` from a game directory using EvMUSH.
+"""
+from unittest import TestCase
+
+from athanor.utils.styling import Styler
+
+
+class TestTimeBucket(TestCase):
+
+    def test_buckets(self):
+        cases = {
+            '%Y-%m-%d': 900,
+            '%b %d %I:%M%p %Z': 60,
+            '%l:%-M %p': 60,
+            '%_H:%M': 60,
+            '%-d %B': 900,
+            '100%% on %d': 900,
+            '%c': None,
+            '%-S': None,
+            '%Q': None,
+        }
+        for time_format, bucket in cases.items():
+            self.assertEqual(Styler.time_bucket(time_format), bucket, time_format)
@@ -1,6 +1,6 @@
 import re
 
-from evennia.utils.ansi import ANSI_PARSER
+from evennia.utils.ansi import ANSI_PARSER, strip_ansi
 from evennia.utils.ansi import ANSIString
 
 import evmush
@@ -50,20 +50,50 @@ def tabular_table(word_list=None, field_width=26, line_length=78, output_separat
     return result_string
 
 
+_NEWLINE_CHARS = ('\n', '%r', '%R', '|/')
+_INDENT_CHARS = ('\t', '%t', '%T', '|-')
+_SANITIZE_PATTERNS = dict()
+
+
+def _sanitize_pattern(strip_newlines, strip_indents):
+    """
+    Compiles (once per combination of options) a single regex that removes every requested sequence.
+    """
+    cache_id = (strip_newlines, strip_indents)
+    if cache_id not in _SANITIZE_PATTERNS:
+        bad_chars = list()
+        if strip_newlines:
+            bad_chars.extend(_NEWLINE_CHARS)
+        if strip_indents:
+            bad_chars.extend(_INDENT_CHARS)
+        _SANITIZE_PATTERNS[cache_id] = re.compile('|'.join(re.escape(c) for c in bad_chars)) if bad_chars else None
+    return _SANITIZE_PATTERNS[cache_id]
+
+
+def strip_markup(text):
+    """
+    Removes Evennia color markup and raw ANSI from text, without building an ANSIString.
+    Text that can't contain any is returned as-is.
+    """
+    if '|' not in text and '\x1b' not in text:
+        return text
+    return strip_ansi(text)
+
+
 def sanitize_string(text=None, length=None, strip_ansi=False, strip_mxp=True, strip_newlines=True, strip_indents=True):
     if not text:
         return ''
     text = text.strip()
-    if strip_mxp:
+    if strip_mxp and '|l' in text:
         text = ANSI_PARSER.strip_mxp(text)
     if strip_ansi:
-        text = ANSIString(text).clean()
-    if strip_newlines:
-        for bad_char in ['\n', '%r', '%R', '|/']:
-            text = text.replace(bad_char, '')
-    if strip_indents:
-        for bad_char in ['\t', '%t', '%T', '|-']:
-            text = text.replace(bad_char, '')
+        text = strip_markup(text)
+    if (pattern := _sanitize_pattern(strip_newlines, strip_indents)):
+        # Removing one sequence can join its neighbours into another, as in "|\n/" -> "|/". Repeat until
+        # nothing is left to remove.
+        removed = True
+        while removed:
+            text, removed = pattern.subn('', text)
     if length:
         text = text[:length]
     return text
@@ -82,14 +112,16 @@ def dramatic_capitalize(capitalize_string=''):
     return capitalize_string
 
 
+_PENN_SUBSTITUTIONS = {'%r': '|/', '%R': '|/', '%t': '|-', '%T': '|-'}
+_PENN_PATTERN = re.compile(r"%[rRtT]")
+
+
 def penn_substitutions(input=None):
     if not input:
         return ''
-    for bad_char in ['%r', '%R']:
-        input = input.replace(bad_char, '|/')
-    for bad_char in ['%t', '%T']:
-        input = input.replace(bad_char, '|-')
-    return input
+    if '%' not in input:
+        return input
+    return _PENN_PATTERN.sub(lambda found: _PENN_SUBSTITUTIONS[found.group(0)], input)
 
 
 SYSTEM_CHARACTERS = ('/', '|', '=', ',')
@@ -106,12 +138,268 @@ def sanitize_name(name, system_name):
 
 
 def partial_match(match_text, candidates):
-    candidate_list = sorted(candidates, key=lambda item: len(str(item)))
-    for candidate in candidate_list:
-        if match_text.lower() == str(candidate).lower():
-            return candidate
-        if str(candidate).lower().startswith(match_text.lower()):
-            return candidate
+    """
+    Returns the candidate with the shortest name that matches or begins with match_text, case-insensitively.
+    Ties go to whichever came first. For repeated lookups against the same candidates, use a PrefixIndex.
+    """
+    match_text = match_text.lower()
+    found, found_len = None, None
+    for candidate in candidates:
+        name = str(candidate)
+        if (found_len is None or len(name) < found_len) and name.lower().startswith(match_text):
+            found, found_len = candidate, len(name)
+    return found
+
+
+class _PrefixNode:
+    __slots__ = ('children', 'item', 'key', 'best')
+
+    def __init__(self):
+        self.children = dict()
+        self.item = None
+        self.key = None
+        # (key, item) of the shortest key at or below this node.
+        self.best = None
+
+
+class PrefixIndex:
+    """
+    A case-folded prefix trie that does what partial_match() does, but without sorting or lowercasing every
+    candidate on each lookup. Every node remembers the shortest key beneath it, so match() costs O(len(text)).
+
+    Items are indexed by str(item) unless a key function is given. Items must be hashable. Re-adding an
+    item (for instance, after a rename) moves it to its new key.
+    """
+
+    def __init__(self, items=None, key=str):
+        self.key_func = key
+        self.root = _PrefixNode()
+        self.keys = dict()
+        if items:
+            self.rebuild(items)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, item):
+        return item in self.keys
+
+    @staticmethod
+    def _better(first, second):
+        if first is None:
+            return second
+        if second is None:
+            return first
+        return min(first, second, key=lambda entry: (len(entry[0]), entry[0]))
+
+    def rebuild(self, items):
+        self.root = _PrefixNode()
+        self.keys = dict()
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        if item in self.keys:
+            self.discard(item)
+        key = self.key_func(item).casefold()
+        if (existing := self._find(key)) and existing.item is not None:
+            # Two items with the same name. The newest one wins.
+            self.discard(existing.item)
+        self.keys[item] = key
+        entry = (key, item)
+        node = self.root
+        node.best = self._better(node.best, entry)
+        for char in key:
+            if not (child := node.children.get(char, None)):
+                child = node.children[char] = _PrefixNode()
+            node = child
+            node.best = self._better(node.best, entry)
+        node.item, node.key = item, key
+        node.best = self._better((key, item), self._best_child(node))
+
+    def _best_child(self, node):
+        best = None
+        for child in node.children.values():
+            best = self._better(best, child.best)
+        return best
+
+    def discard(self, item):
+        if (key := self.keys.pop(item, None)) is None:
+            return
+        path = [self.root]
+        node = self.root
+        for char in key:
+            if not (node := node.children.get(char, None)):
+                return
+            path.append(node)
+        if node.item == item:
+            node.item, node.key = None, None
+        # Walk back up, pruning empty nodes and recomputing the shortest key beneath each one.
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            own = (node.key, node.item) if node.item is not None else None
+            node.best = self._better(own, self._best_child(node))
+            if depth and node.best is None:
+                del path[depth - 1].children[key[depth - 1]]
+
+    remove = discard
+
+    def _find(self, match_text):
+        node = self.root
+        for char in match_text.casefold():
+            if not (node := node.children.get(char, None)):
+                return None
+        return node
+
+    def match(self, match_text, check=None):
+        """
+        Find the item with the shortest name that matches or begins with match_text.
+
+        Args:
+            match_text (str): What to search for.
+            check (callable): Optional filter such as a visibility check. Only items for which it returns
+                True are considered. This walks the matching subtree, shortest keys first.
+
+        Returns:
+            item or None
+        """
+        if not (node := self._find(match_text)) or not node.best:
+            return None
+        if check is None:
+            return node.best[1]
+        for item in self.matches(match_text, node=node):
+            if check(item):
+                return item
+        return None
+
+    def matches(self, match_text, node=None):
+        """
+        Yields every item whose name begins with match_text, shortest names first.
+        """
+        if node is None and not (node := self._find(match_text)):
+            return
+        level = [node]
+        while level:
+            found = sorted((n.key, n.item) for n in level if n.item is not None)
+            for key, item in found:
+                yield item
+            level = [child for n in level for child in n.children.values()]
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class _NameNode:
+    __slots__ = ('children', 'value', 'has_value')
+
+    def __init__(self):
+        self.children = dict()
+        self.value = None
+        self.has_value = False
+
+
+class NameMatcher:
+    """
+    Finds any of a large, changing set of names inside text, case-insensitively and only at word boundaries.
+    It replaces compiling one giant \\b(name1|name2|...)\\b regex: names are kept in a trie which is walked only
+    from the start of each word. Adding or removing a name is O(len(name)), and scanning a line costs about its
+    length no matter how many names exist.
+
+    Where several names match at the same place, the longest wins.
+    """
+
+    def __init__(self, names=None):
+        """
+        Args:
+            names (dict): Optional map of name -> value to start with.
+        """
+        self.root = _NameNode()
+        self.count = 0
+        if names:
+            self.rebuild(names)
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def _fold(name):
+        # Lowercasing char-by-char keeps every trie step aligned to exactly one character of the original text.
+        return [char.lower() for char in name]
+
+    def rebuild(self, names):
+        self.root = _NameNode()
+        self.count = 0
+        for name, value in names.items():
+            self.add(name, value)
+
+    def add(self, name, value=None):
+        node = self.root
+        for step in self._fold(name):
+            if not (child := node.children.get(step, None)):
+                child = node.children[step] = _NameNode()
+            node = child
+        if not node.has_value:
+            self.count += 1
+        node.value, node.has_value = value, True
+
+    def discard(self, name):
+        path = [(None, self.root)]
+        node = self.root
+        for step in self._fold(name):
+            if not (node := node.children.get(step, None)):
+                return
+            path.append((step, node))
+        if not node.has_value:
+            return
+        node.value, node.has_value = None, False
+        self.count -= 1
+        while len(path) > 1:
+            step, node = path.pop()
+            if node.children or node.has_value:
+                break
+            del path[-1][1].children[step]
+
+    remove = discard
+
+    def finditer(self, text):
+        """
+        Yields (start, end, value) for every name found in text, left to right, without overlaps.
+        """
+        length = len(text)
+        pos = 0
+        root = self.root
+        while pos < length:
+            if not _is_word_char(text[pos]) or (pos and _is_word_char(text[pos - 1])):
+                pos += 1
+                continue
+            node = root
+            found = None
+            cur = pos
+            while cur < length and (node := node.children.get(text[cur].lower(), None)):
+                cur += 1
+                if node.has_value and (cur == length or not _is_word_char(text[cur])):
+                    found = (cur, node.value)
+            if found:
+                yield pos, found[0], found[1]
+                pos = found[0]
+            else:
+                pos += 1
+
+    def sub(self, func, text):
+        """
+        Replaces every name found in text with func(found_text, value).
+        """
+        result = list()
+        last = 0
+        for start, end, value in self.finditer(text):
+            result.append(text[last:start])
+            result.append(func(text[start:end], value))
+            last = end
+        if not last:
+            return text
+        result.append(text[last:])
+        return ''.join(result)
 
 
 def mxp(text="", command="", hints=""):
@@ -174,11 +462,10 @@ class Speech:
         if rendered_text:
             self.markup_string = rendered_text
         else:
-            self.markup_string = self.controller.reg_names.sub(self.markup_names, self.speech_string)
+            self.markup_string = self.controller.name_matcher.sub(self.markup_names, self.speech_string)
 
-    def markup_names(self, match):
-        found = match.group('found')
-        return f'^^^{self.controller.name_map[found.upper()].id}:{found}^^^'
+    def markup_names(self, found, obj):
+        return f'^^^{obj.id}:{found}^^^'
 
     def __str__(self):
         str(self.demarkup())
@@ -205,6 +492,12 @@ class Speech:
     def render(self, viewer=None):
         if not viewer:
             return ANSIString(self.demarkup())
+        return self.colorize(self.render_markup(), viewer)
+
+    def render_markup(self):
+        """
+        The viewer-independent form of render(), with names still marked up.
+        """
         return_string = None
         if self.special_format == 0:
             return_string = f'{self.markup_name} {self.action_string}, "{self.markup_string}|n"'
@@ -219,8 +512,7 @@ class Speech:
         if self.mode == 'page' and len(self.targets) > 1:
             pref = f'(To {", ".join(self.targets)})'
             return_string = f'{pref} {return_string}'
-
-        return self.colorize(return_string, viewer)
+        return return_string
 
     def log(self):
         return_string = None
@@ -253,18 +545,22 @@ class Speech:
             return_string = f'{self.title} {return_string}'
         return ANSIString(return_string)
 
-    def colorize(self, message, viewer):
-        viewer = viewer.get_account() if viewer and hasattr(viewer, 'get_account') else None
-        colors = dict()
+    def speech_colors(self, viewer):
+        """
+        Looks up the viewer's speech colors for this Speech's color_mode.
+
+        Returns:
+            colors (dict): quotes, speech, speaker, self and other colors. '' where unset.
+        """
         styler = viewer.styler if viewer else athanor.STYLER(None)
+        colors = dict()
         for op in ("quotes", "speech", "speaker", "self", 'other'):
             colors[op] = styler.options.get(f"{op}_{self.color_mode}", '')
             if colors[op] == 'n':
                 colors[op] = ''
+        return colors
 
-        quote_color = colors["quotes"]
-        speech_color = colors["speech"]
-
+    def color_speech(self, message, quote_color, speech_color):
         def color_speech(found):
             if not quote_color and not speech_color:
                 return f'"{found.group("found")}"'
@@ -274,28 +570,90 @@ class Speech:
                 return f'"|n|{speech_color}{found.group("found")}|n"'
             if quote_color and speech_color:
                 return f'|{quote_color}"|n|{speech_color}{found.group("found")}|n|{quote_color}"|n'
+        return self.re_speech.sub(color_speech, message)
+
+    def name_color(self, thing_id, viewer, colors):
+        """
+        Decides which color a marked-up name gets for this viewer.
+
+        Returns:
+            color (str): A color code, or '' for none.
+        """
+        if not viewer:
+            return ''
+        if not (obj := self.controller.id_map.get(thing_id, None)):
+            return ''
+        custom = viewer.colorizer.get(obj, None)
+        if custom and custom != 'n':
+            return custom
+        if obj == viewer and colors["self"]:
+            return colors['self']
+        if obj == self.speaker and colors['speaker']:
+            return colors['speaker']
+        return ''
+
+    def colorize(self, message, viewer):
+        viewer = viewer.get_account() if viewer and hasattr(viewer, 'get_account') else None
+        colors = self.speech_colors(viewer)
 
         def color_names(found):
             data = found.groupdict()
             thing_name = data["thing_name"]
-            if not viewer:
-                return thing_name
-            thing_id = int(data["thing_id"])
-            if not (obj := self.controller.id_map.get(thing_id, None)):
-                return thing_name
-            custom = viewer.colorizer.get(obj, None)
-            if custom and custom != 'n':
-                return f"|n|{custom}{thing_name}|n"
-            if obj == viewer and colors["self"]:
-                return f"|n|{colors['self']}{thing_name}|n"
-            if obj == self.speaker and colors['speaker']:
-                return f"|n|{colors['speaker']}{thing_name}|n"
+            if (color := self.name_color(int(data["thing_id"]), viewer, colors)):
+                return f"|n|{color}{thing_name}|n"
             return thing_name
 
-        colorized_string = self.re_speech.sub(color_speech, message)
+        colorized_string = self.color_speech(message, colors["quotes"], colors["speech"])
         colorized_string = self.re_name.sub(color_names, colorized_string)
         return colorized_string
 
+    def render_many(self, viewers):
+        """
+        Renders this Speech for a whole room or channel at once. Viewers are grouped by their effective
+        colorization: their quote and speech colors plus the color each referenced name gets for them. Each
+        group is rendered only once.
+
+        Args:
+            viewers (iterable): Objects or Accounts that will see this Speech.
+
+        Returns:
+            rendered (dict): viewer -> rendered text.
+        """
+        results = dict()
+        markup = None
+        by_speech = dict()
+        by_profile = dict()
+        for viewer in viewers:
+            if not viewer:
+                results[viewer] = self.render(viewer)
+                continue
+            if markup is None:
+                markup = self.render_markup()
+            account = viewer.get_account() if hasattr(viewer, 'get_account') else None
+            colors = self.speech_colors(account)
+            speech_key = (colors["quotes"], colors["speech"])
+            if not (segments := by_speech.get(speech_key, None)):
+                # re_name has two groups, so split() gives: text, id, name, text, id, name, ..., text
+                segments = self.re_name.split(self.color_speech(markup, *speech_key))
+                by_speech[speech_key] = segments
+            name_colors = tuple(self.name_color(int(segments[i]), account, colors)
+                                for i in range(1, len(segments), 3))
+            profile = (speech_key, name_colors)
+            if (found := by_profile.get(profile, None)) is None:
+                found = self._join_segments(segments, name_colors)
+                by_profile[profile] = found
+            results[viewer] = found
+        return results
+
+    @staticmethod
+    def _join_segments(segments, name_colors):
+        output = [segments[0]]
+        for num, color in enumerate(name_colors):
+            thing_name = segments[num * 3 + 2]
+            output.append(f"|n|{color}{thing_name}|n" if color else thing_name)
+            output.append(segments[num * 3 + 3])
+        return ''.join(output)
+
 
 def iter_to_string(iter):
     return ', '.join(str(i) for i in iter)
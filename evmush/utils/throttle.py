@@ -0,0 +1,74 @@
+"""
+In-memory, per-host rate limiting for expensive unauthenticated operations like logins and Account creation.
+"""
+import time
+from collections import OrderedDict
+
+
+def session_host(session):
+    """
+    Returns a session's host IP. Evennia stores either a string or an (ip, port) tuple.
+    """
+    address = session.address
+    if isinstance(address, (tuple, list)):
+        address = address[0]
+    return str(address)
+
+
+class TokenBucketThrottle:
+    """
+    A token bucket per host: each host may do `burst` operations at once, and gets `rate` more per second.
+
+    Hosts are kept in LRU order and the least recently seen is dropped past max_hosts, so memory stays
+    bounded no matter how many addresses try. Dropping a host only ever forgives it, so this is safe.
+    """
+
+    def __init__(self, name, rate=0.2, burst=5, max_hosts=10000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_hosts = max_hosts
+        # host -> [tokens, last_update]
+        self.buckets = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def check(self, host):
+        """
+        Takes a token for host if one is available.
+
+        Returns:
+            allowed (bool)
+        """
+        now = time.monotonic()
+        if (bucket := self.buckets.get(host, None)) is None:
+            bucket = self.buckets[host] = [float(self.burst), now]
+            if len(self.buckets) > self.max_hosts:
+                self.buckets.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.buckets.move_to_end(host)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            self.rejected += 1
+            return False
+        bucket[0] -= 1
+        self.allowed += 1
+        return True
+
+    def enforce(self, host, message="Too many attempts. Please wait a while and try again."):
+        if not self.check(host):
+            raise ValueError(message)
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'rate': self.rate,
+            'burst': self.burst,
+            'hosts': len(self.buckets),
+            'allowed': self.allowed,
+            'rejected': self.rejected,
+            'evicted': self.evicted
+        }